@@ -5,6 +5,28 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
+
+ASGI-профиль (табло, дашборды операторов, long-poll очереди):
+
+    ATU_ASGI=1 uvicorn atu_queue.asgi:application --host 0.0.0.0 --port 8000 --workers 2
+
+Async-представления — /operator/queue.json, /operator/queue-wait.json,
+/api/tickets/pending/, /api/tickets/board/, /api/config/ — работают прямо в event loop:
+сотни одновременных опросов и открытых long-poll держит один процесс без потока
+на каждое соединение. Остальные (sync) представления Django выполняет в пуле потоков.
+
+ATU_ASGI=1 выключает постоянные соединения с БД (CONN_MAX_AGE=0): под ASGI каждое
+соединение живёт в своём потоке sync_to_async, и долгоживущие соединения копятся.
+Для Postgres вместо этого ставьте пул на стороне БД (pgbouncer).
+Табло в зале подключаются по WebSocket к /ws/board/ (tickets/hub.py): одно соединение
+на экран, события вызова/завершения/отмены приходят сразу, опрашивать /api/tickets/board/
+не нужно. Остальные WebSocket-пути закрываются. За nginx нужен proxy_set_header Upgrade/Connection.
+/metrics/ за прокси: задайте ATU_METRICS_TOKEN (Prometheus шлёт его как Bearer)
+или закройте location /metrics/ в nginx — иначе снаружи он виден как запрос с 127.0.0.1.
+Метрики запросов и талонов у каждого воркера свои (tickets/metrics.py): при --workers 2
+Prometheus должен опрашивать каждый процесс отдельно — запустите по uvicorn на порт
+(--port 8001, --port 8002, оба за nginx upstream) и укажите оба порта целями scrape.
+Статика под ASGI не раздаётся — её отдаёт nginx (collectstatic).
 """
 
 import os
@@ -13,4 +35,15 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'atu_queue.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from tickets.hub import board_socket  # noqa: E402  (после настройки Django)
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "websocket":
+        if scope["path"] == "/ws/board/":
+            return await board_socket(scope, receive, send)
+        await receive()
+        return await send({"type": "websocket.close", "code": 1000})
+    return await django_application(scope, receive, send)
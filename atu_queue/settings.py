@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from corsheaders.defaults import default_headers
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -48,6 +51,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "tickets.metrics.RequestMetricsMiddleware",
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -57,11 +61,14 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.common.CommonMiddleware",
+    # включается флагом "debug.profiler" в админке, см. PROFILER_LOG
+    "config.middleware.ProfilerMiddleware",
 ]
 
 ROOT_URLCONF = 'atu_queue.urls'
 
 CORS_ALLOW_ALL_ORIGINS = True
+CORS_ALLOW_HEADERS = (*default_headers, "idempotency-key")
 
 TEMPLATES = [
     {
@@ -91,13 +98,47 @@ WSGI_APPLICATION = 'atu_queue.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
 
+# SQLite-профиль для работы на одном сервере под нагрузкой:
+# - WAL: читатели не блокируют писателя и наоборот;
+# - timeout (busy timeout): ждать освободившуюся блокировку, а не падать с "database is locked";
+# - transaction_mode IMMEDIATE: каждый transaction.atomic начинается с BEGIN IMMEDIATE и сразу
+#   берёт блокировку записи. select_for_update в SQLite ничего не делает, поэтому выдача номера
+#   и вызов талона (perform_create, next_for_desk, operator_call_next) сериализуются именно так,
+#   без deadlock-а при повышении блокировки с чтения до записи;
+# - CONN_MAX_AGE: постоянные соединения, PRAGMA выполняются один раз на соединение.
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            'timeout': 20,
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': 'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL;',
+        },
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        # тесты — тоже в файле, а не в памяти: с WAL и busy timeout, как в работе
+        # (in-memory shared cache сразу отвечает "table is locked" параллельным потокам)
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
     }
 }
 
+# Postgres вместо SQLite (локальный стенд, manage.py loadtest и т.п.):
+# POSTGRES_DB=atu_queue POSTGRES_USER=... POSTGRES_PASSWORD=... python manage.py ...
+if os.environ.get("POSTGRES_DB"):
+    DATABASES['default'] = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': os.environ["POSTGRES_DB"],
+        'USER': os.environ.get("POSTGRES_USER", "postgres"),
+        'PASSWORD': os.environ.get("POSTGRES_PASSWORD", ""),
+        'HOST': os.environ.get("POSTGRES_HOST", "localhost"),
+        'PORT': os.environ.get("POSTGRES_PORT", "5432"),
+    }
+
+# ASGI-профиль (см. atu_queue/asgi.py): без постоянных соединений
+if os.environ.get("ATU_ASGI"):
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -142,8 +183,73 @@ REST_FRAMEWORK = {
     "DEFAULT_PERMISSION_CLASSES": (
         "rest_framework.permissions.AllowAny",
     ),
+    # сколько своих прокси стоит перед Django (nginx на том же хосте — 1): IP клиента для
+    # лимита выдачи талонов берётся из X-Forwarded-For только за ними; 0 — REMOTE_ADDR
+    "NUM_PROXIES": int(os.environ.get("ATU_NUM_PROXIES", 0)),
+}
+
+# Нумерация талонов: "daily" — A-101 с начала каждого дня,
+# "session" — сквозная нумерация до смены TICKET_NUMBER_SESSION.
+TICKET_NUMBER_RESET = "daily"
+TICKET_NUMBER_SESSION = ""
+
+# Как часто процесс сверяет версию FeatureFlag (секунды); сами флаги берутся из кэша
+FEATURE_FLAGS_RECHECK = 2
+
+# Журнал операторов пишется пачками из фонового потока (operators/logbuffer.py)
+OPERATOR_LOG_BUFFER = {
+    "sync": False,
+    "max_size": 100,
+    "interval": 2.0,
 }
 
+# Long-poll очереди оператора (/operator/queue-wait.json) — только под ASGI;
+# под WSGI ответ сразу, и дашборд опрашивает раз в QUEUE_WAIT_SHORT_POLL секунд
+QUEUE_WAIT_TIMEOUT = 25
+QUEUE_WAIT_POLL = 2
+QUEUE_WAIT_SHORT_POLL = 3
+
+# Idempotency-Key для POST /api/tickets/: сколько секунд повтор с тем же ключом
+# возвращает уже выданный талон (tickets/idempotency.py)
+IDEMPOTENCY_KEYS = {
+    "ttl": 24 * 3600,
+}
+
+# WebSocket табло (/ws/board/, tickets/hub.py): buffer — сколько последних событий
+# досылается переподключившемуся экрану, poll — как часто (сек) подхватывать события
+# других процессов, client_queue — сколько неотправленных событий терпим у медленного экрана,
+# late — сколько секунд перечитывать недавние события (в Postgres commit идёт не по порядку id)
+BOARD_HUB = {
+    "buffer": 200,
+    "poll": 1.0,
+    "client_queue": 100,
+    "late": 10.0,
+}
+
+# Оценка времени обслуживания (EWMA по desk и услуге) и ожидания на экране талона:
+# alpha — вес нового DONE, default — секунд на заявителя, пока данных нет,
+# max — потолок одного замера (забытый талон не портит оценку)
+SERVICE_TIME_ESTIMATOR = {
+    "alpha": 0.2,
+    "default": 300,
+    "max": 3600,
+}
+
+# Профилировщик запросов (FeatureFlag "debug.profiler"): JSON-строка на запрос в ротируемый файл
+PROFILER_LOG = {
+    "path": BASE_DIR / "profiler.log",
+    "max_bytes": 5 * 1024 * 1024,
+    "backup_count": 5,
+}
+
+# /metrics/ (Prometheus): с METRICS_TOKEN — только с заголовком "Authorization: Bearer <токен>";
+# без него — только прямым запросам с этих адресов (запросы через прокси с X-Forwarded-For
+# отклоняются). Если прокси не ставит X-Forwarded-For, закройте /metrics/ в нём самом.
+# Счётчики и гистограммы — в памяти процесса: при нескольких воркерах scrape target
+# должен быть одним процессом (один воркер или по uvicorn на порт), см. tickets/metrics.py.
+METRICS_ALLOWED_IPS = ("127.0.0.1", "::1")
+METRICS_TOKEN = os.environ.get("ATU_METRICS_TOKEN", "")
+
 LOGIN_REDIRECT_URL = "/operator/"
 LOGOUT_REDIRECT_URL = "/operator/login/"
 LOGIN_URL = "/operator/login/"
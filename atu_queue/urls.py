@@ -5,6 +5,7 @@ from django.shortcuts import redirect
 from django.contrib.auth import views as auth_views
 from operators.views import operator_dashboard
 from siteconfig.views import app_online
+from tickets.views import metrics
 def home(request):
     return redirect("/app/index/")
 
@@ -17,6 +18,9 @@ urlpatterns = [
     path("api/", include("tickets.urls")),
     path("api/config/", include("config.urls")),  # ✅ ВАЖНО
 
+    # Prometheus (только локально, см. METRICS_ALLOWED_IPS)
+    path("metrics/", metrics, name="metrics"),
+
     # Operator auth + dashboard
     path("operator/login/", auth_views.LoginView.as_view(template_name="operator/login.html"), name="operator_login"),
     path("operator/logout/", auth_views.LogoutView.as_view(next_page="/operator/login/"), name="operator_logout"),
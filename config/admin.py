@@ -1,5 +1,6 @@
 from django.contrib import admin
 from .models import FeatureFlag, UIText
+from .utils import bump_revision, invalidate_flags
 
 
 @admin.register(FeatureFlag)
@@ -9,6 +10,11 @@ class FeatureFlagAdmin(admin.ModelAdmin):
     search_fields = ("key",)
     ordering = ("key",)
 
+    def delete_queryset(self, request, queryset):
+        # массовое удаление идёт мимо FeatureFlag.delete()
+        super().delete_queryset(request, queryset)
+        invalidate_flags()
+
 
 @admin.register(UIText)
 class UITextAdmin(admin.ModelAdmin):
@@ -17,6 +23,10 @@ class UITextAdmin(admin.ModelAdmin):
     search_fields = ("key", "text")
     ordering = ("key", "lang")
 
+    def delete_queryset(self, request, queryset):
+        super().delete_queryset(request, queryset)
+        bump_revision("ui")
+
     def short_text(self, obj):
         t = (obj.text or "").strip()
         return (t[:60] + "…") if len(t) > 60 else t
@@ -1,5 +1,19 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+def _config_migrated(sender, using, **kwargs):
+    # data migrations change FeatureFlag/UIText without save()
+    from django.db import connections
+    from .models import Revision
+    from .utils import invalidate_config
+
+    if Revision._meta.db_table in connections[using].introspection.table_names():
+        invalidate_config()
 
 
 class ConfigConfig(AppConfig):
     name = 'config'
+
+    def ready(self):
+        post_migrate.connect(_config_migrated, sender=self)
@@ -0,0 +1,112 @@
+import json
+import logging
+import time
+from collections import Counter
+from logging.handlers import RotatingFileHandler
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connection
+
+from .utils import ais_enabled, is_enabled
+
+
+PROFILER_FLAG = "debug.profiler"
+
+logger = logging.getLogger("atu_queue.profiler")
+
+
+def _profiler_logger():
+    """Attach the rotating file handler on first use, so nothing is created while the flag is off."""
+    if not logger.handlers:
+        opts = {
+            "path": settings.BASE_DIR / "profiler.log",
+            "max_bytes": 5 * 1024 * 1024,
+            "backup_count": 5,
+            **getattr(settings, "PROFILER_LOG", {}),
+        }
+        handler = RotatingFileHandler(
+            opts["path"], maxBytes=opts["max_bytes"], backupCount=opts["backup_count"], encoding="utf-8"
+        )
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+    return logger
+
+
+class ProfilerMiddleware:
+    """
+    Per-request SQL/timing profile, switched on by the "debug.profiler" FeatureFlag.
+    One JSON line per request: view, status, wall time, query count, total SQL time,
+    the slowest statements and the most repeated one (N+1 hint).
+    When the flag is off the cost is one lookup in the cached flag snapshot.
+    Queries run while a streaming response is consumed are not included.
+    """
+    slowest = 5
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not is_enabled(PROFILER_FLAG, False):
+            return self.get_response(request)
+
+        queries = []
+        started = time.perf_counter()
+        with connection.execute_wrapper(self._recorder(queries)):
+            response = self.get_response(request)
+        self.write(request, response, time.perf_counter() - started, queries)
+        return response
+
+    async def __acall__(self, request):
+        if not await ais_enabled(PROFILER_FLAG, False):
+            return await self.get_response(request)
+
+        # ORM в async-представлениях выполняется в потоке sync_to_async (thread_sensitive),
+        # у которого своё соединение — обёртку ставим на него (connection разрешаем внутри
+        # этого потока, а не здесь, в потоке event loop)
+        queries = []
+        recorder = self._recorder(queries)
+        await sync_to_async(lambda: connection.execute_wrappers.append(recorder))()
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(lambda: connection.execute_wrappers.remove(recorder))()
+        self.write(request, response, time.perf_counter() - started, queries)
+        return response
+
+    @staticmethod
+    def _recorder(queries):
+        def record(execute, sql, params, many, context):
+            started = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                queries.append((time.perf_counter() - started, sql))
+        return record
+
+    def write(self, request, response, wall, queries):
+        match = getattr(request, "resolver_match", None)
+        repeated, repeats = Counter(sql for _, sql in queries).most_common(1)[0] if queries else ("", 0)
+        _profiler_logger().info(json.dumps({
+            "method": request.method,
+            "path": request.path,
+            "view": match.view_name if match else None,
+            "status": response.status_code,
+            "wall_ms": round(wall * 1000, 2),
+            "queries": len(queries),
+            "sql_ms": round(sum(t for t, _ in queries) * 1000, 2),
+            "slowest": [
+                {"ms": round(t * 1000, 2), "sql": sql[:500]}
+                for t, sql in sorted(queries, key=lambda q: q[0], reverse=True)[:self.slowest]
+            ],
+            "most_repeated": {"times": repeats, "sql": repeated[:500]} if repeats > 1 else None,
+        }, ensure_ascii=False))
@@ -9,6 +9,17 @@ class FeatureFlag(models.Model):
     def __str__(self):
         return f"{self.key} = {'ON' if self.enabled else 'OFF'}"
 
+    def save(self, *args, **kwargs):
+        from .utils import invalidate_flags
+        super().save(*args, **kwargs)
+        invalidate_flags()
+
+    def delete(self, *args, **kwargs):
+        from .utils import invalidate_flags
+        result = super().delete(*args, **kwargs)
+        invalidate_flags()
+        return result
+
 
 class UIText(models.Model):
     LANG_CHOICES = (
@@ -30,3 +41,26 @@ class UIText(models.Model):
 
     def __str__(self):
         return f"{self.key} [{self.lang}]"
+
+    def save(self, *args, **kwargs):
+        from .utils import bump_revision
+        super().save(*args, **kwargs)
+        bump_revision("ui")
+
+    def delete(self, *args, **kwargs):
+        from .utils import bump_revision
+        result = super().delete(*args, **kwargs)
+        bump_revision("ui")
+        return result
+
+
+class Revision(models.Model):
+    """
+    Счётчик версии данных по ключу ("flags", "ui").
+    Увеличивается при каждом изменении — по нему строятся ETag и инвалидируются кэши процессов.
+    """
+    key = models.CharField(max_length=64, unique=True)
+    value = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.key} @ {self.value}"
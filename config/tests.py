@@ -1,3 +1,113 @@
-from django.test import TestCase
+import asyncio
+import json
+import logging
+from unittest import mock
 
-# Create your tests here.
+from django.apps import apps
+from django.db.models.signals import post_migrate
+from django.test import AsyncClient, TransactionTestCase, override_settings
+
+from . import utils
+from .middleware import PROFILER_FLAG
+from .models import FeatureFlag, UIText
+from .utils import bump_revision, invalidate_config, is_enabled
+
+
+class ConfigEtagTests(TransactionTestCase):
+    def etag(self):
+        return self.client.get("/api/config/")["ETag"]
+
+    def test_not_modified_until_saved(self):
+        response = self.client.get("/api/config/")
+        self.assertIn("no-cache", response["Cache-Control"])
+        etag = response["ETag"]
+        self.assertEqual(self.client.get("/api/config/", HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        FeatureFlag.objects.create(key="kiosk.enabled", enabled=False)
+        response = self.client.get("/api/config/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(response.json()["flags"], {"kiosk.enabled": False})
+
+    def test_bulk_update_needs_invalidate_config(self):
+        UIText.objects.create(key="title", lang="ru", text="Очередь")
+        etag = self.etag()
+        UIText.objects.filter(key="title").update(text="Электронная очередь")
+        self.assertEqual(self.etag(), etag)
+
+        invalidate_config()
+        response = self.client.get("/api/config/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["ui"]["ru"]["title"], "Электронная очередь")
+
+    def test_migrate_invalidates(self):
+        etag = self.etag()
+        FeatureFlag.objects.bulk_create([FeatureFlag(key="kiosk.enabled", enabled=False)])
+        config = apps.get_app_config("config")
+        post_migrate.send(sender=config, app_config=config, verbosity=0, interactive=False, using="default")
+        self.assertEqual(self.client.get("/api/config/").json()["flags"], {"kiosk.enabled": False})
+        self.assertNotEqual(self.etag(), etag)
+
+
+class FeatureFlagCacheTests(TransactionTestCase):
+    def setUp(self):
+        utils._flags["revision"] = None
+
+    def test_snapshot_is_cached(self):
+        FeatureFlag.objects.create(key="kiosk.enabled", enabled=False)
+        self.assertFalse(is_enabled("kiosk.enabled"))
+        with self.assertNumQueries(0):
+            self.assertFalse(is_enabled("kiosk.enabled"))
+            self.assertTrue(is_enabled("missing.flag"))
+
+    def test_save_invalidates(self):
+        flag = FeatureFlag.objects.create(key="kiosk.enabled", enabled=False)
+        self.assertFalse(is_enabled("kiosk.enabled"))
+        flag.enabled = True
+        flag.save()
+        self.assertTrue(is_enabled("kiosk.enabled"))
+
+    def test_other_process_change_seen_after_recheck(self):
+        FeatureFlag.objects.create(key="kiosk.enabled", enabled=False)
+        self.assertFalse(is_enabled("kiosk.enabled"))
+        # другой воркер: строка и ревизия изменены, снимок этого процесса не сброшен
+        FeatureFlag.objects.filter(key="kiosk.enabled").update(enabled=True)
+        bump_revision("flags")
+        self.assertFalse(is_enabled("kiosk.enabled"))
+        with override_settings(FEATURE_FLAGS_RECHECK=0):
+            self.assertTrue(is_enabled("kiosk.enabled"))
+
+
+class ProfilerMiddlewareTests(TransactionTestCase):
+    def setUp(self):
+        utils._flags["revision"] = None
+        self.logger = logging.getLogger("config.tests.profiler")
+        patcher = mock.patch("config.middleware._profiler_logger", return_value=self.logger)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_off_by_default(self):
+        with self.assertNoLogs(self.logger):
+            self.client.get("/api/tickets/")
+
+    def test_logs_queries_per_request(self):
+        FeatureFlag.objects.create(key=PROFILER_FLAG, enabled=True)
+        with self.assertLogs(self.logger) as logs:
+            self.client.get("/api/tickets/")
+        (line,) = logs.records
+        profile = json.loads(line.getMessage())
+        self.assertEqual((profile["path"], profile["status"]), ("/api/tickets/", 200))
+        self.assertGreater(profile["queries"], 0)
+        self.assertLessEqual(len(profile["slowest"]), 5)
+
+    def test_async_views_are_profiled(self):
+        FeatureFlag.objects.create(key=PROFILER_FLAG, enabled=True)
+
+        async def scenario():
+            return await AsyncClient().get("/api/tickets/board/")
+
+        with self.assertLogs(self.logger) as logs:
+            asyncio.run(scenario())
+        profile = json.loads(logs.records[0].getMessage())
+        self.assertEqual(profile["path"], "/api/tickets/board/")
+        self.assertGreater(profile["queries"], 0)
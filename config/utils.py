@@ -1,13 +1,89 @@
-from .models import FeatureFlag
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import FeatureFlag, Revision
+
+
+# per-process snapshot of all flags, keyed by the "flags" revision
+_flags_lock = threading.Lock()
+_flags = {"revision": None, "checked": 0.0, "values": {}}
+
+
+def flag_snapshot() -> dict:
+    """
+    All flags as {key: enabled}, loaded in one query and cached per process.
+    The "flags" revision is re-read at most every FEATURE_FLAGS_RECHECK seconds;
+    the table is reloaded only when it changed (admin save/delete bumps it).
+    """
+    now = time.monotonic()
+    recheck = getattr(settings, "FEATURE_FLAGS_RECHECK", 2)
+    if _flags["revision"] is not None and now - _flags["checked"] < recheck:
+        return _flags["values"]
+
+    with _flags_lock:
+        if _flags["revision"] is not None and now - _flags["checked"] < recheck:
+            return _flags["values"]
+        revision = get_revision("flags")
+        if revision != _flags["revision"]:
+            _flags["values"] = dict(FeatureFlag.objects.values_list("key", "enabled"))
+            _flags["revision"] = revision
+        _flags["checked"] = now
+    return _flags["values"]
+
+
+def invalidate_flags() -> None:
+    """Bump the "flags" revision (other workers reload) and drop this process' snapshot."""
+    bump_revision("flags")
+    _flags["revision"] = None
+
+
+def invalidate_config() -> None:
+    """
+    Bump the "flags" and "ui" revisions. Only FeatureFlag/UIText save() and delete()
+    do this on their own; call it after changing those rows any other way
+    (QuerySet.update(), bulk_create, raw SQL, data migrations), otherwise the flag
+    snapshots and the /api/config/ ETag and cached body stay stale.
+    Runs after every `migrate` (see ConfigConfig.ready).
+    """
+    invalidate_flags()
+    bump_revision("ui")
 
 
 def is_enabled(key: str, default: bool = True) -> bool:
     """
-    Feature flags from DB.
+    Feature flags from DB (cached snapshot, see flag_snapshot).
     If flag not found => default
     """
+    return bool(flag_snapshot().get(key, default))
+
+
+async def ais_enabled(key: str, default: bool = True) -> bool:
+    """is_enabled for async views: no thread hop while the cached snapshot is fresh."""
+    recheck = getattr(settings, "FEATURE_FLAGS_RECHECK", 2)
+    if _flags["revision"] is not None and time.monotonic() - _flags["checked"] < recheck:
+        return bool(_flags["values"].get(key, default))
+    return await sync_to_async(is_enabled)(key, default)
+
+
+def get_revision(key: str) -> int:
+    return Revision.objects.filter(key=key).values_list("value", flat=True).first() or 0
+
+
+async def aget_revision(key: str) -> int:
+    return (await Revision.objects.filter(key=key).values_list("value", flat=True).afirst()) or 0
+
+
+def bump_revision(key: str) -> None:
+    """Increment revision `key` (creates it on first use)."""
+    if Revision.objects.filter(key=key).update(value=F("value") + 1):
+        return
     try:
-        obj = FeatureFlag.objects.get(key=key)
-        return bool(obj.enabled)
-    except FeatureFlag.DoesNotExist:
-        return bool(default)
+        with transaction.atomic():
+            Revision.objects.create(key=key, value=1)
+    except IntegrityError:
+        Revision.objects.filter(key=key).update(value=F("value") + 1)
@@ -1,20 +1,52 @@
-from django.http import JsonResponse
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+from django.views.decorators.cache import cache_control
 from django.views.decorators.http import require_GET
-from .models import FeatureFlag, UIText
 
+from .models import FeatureFlag, Revision, UIText
 
-@require_GET
-def api_config(request):
+
+# собранный ответ /api/config/ на последнюю версию данных (per process)
+_payload = {"etag": None, "body": b""}
+
+
+async def _build_config():
     # flags
-    flags = {f.key: bool(f.enabled) for f in FeatureFlag.objects.all()}
+    flags = {f.key: bool(f.enabled) async for f in FeatureFlag.objects.all()}
 
     # ui texts grouped by lang
     ui = {"ru": {}, "kz": {}, "en": {}}
-    for row in UIText.objects.all():
+    async for row in UIText.objects.all():
         ui.setdefault(row.lang, {})
         ui[row.lang][row.key] = row.text
 
-    return JsonResponse({
+    return {
         "flags": flags,
         "ui": ui,
-    })
+    }
+
+
+async def config_etag():
+    """ETag = версии флагов и текстов (save()/delete(), migrate, config.utils.invalidate_config)."""
+    revs = {key: value async for key, value in Revision.objects.filter(key__in=("flags", "ui")).values_list("key", "value")}
+    return quote_etag(f"cfg-{revs.get('flags', 0)}-{revs.get('ui', 0)}")
+
+
+@require_GET
+@cache_control(no_cache=True)
+async def api_config(request):
+    # async-представление: под ASGI опрос конфига не занимает поток.
+    # @condition вызывает etag_func синхронно, поэтому 304 считаем здесь сами
+    etag = await config_etag()
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        if _payload["etag"] != etag:
+            body = json.dumps(await _build_config(), cls=DjangoJSONEncoder).encode()
+            _payload.update(etag=etag, body=body)
+        response = HttpResponse(_payload["body"], content_type="application/json")
+    response.headers.setdefault("ETag", etag)
+    return response
@@ -0,0 +1,113 @@
+"""
+Буфер журнала операторов: OperatorLog пишутся не в запросе, а пачками (bulk_create)
+из фонового потока — по достижении max_size записей или раз в interval секунд.
+
+Настройки (settings.OPERATOR_LOG_BUFFER):
+    sync      — писать сразу, без буфера (для тестов и отладки)
+    max_size  — сколько записей копить до немедленного сброса
+    interval  — максимальная задержка записи, секунды
+
+Журнал согласован «в конечном счёте»: у каждого воркера свой буфер, и выгрузка CSV
+сбрасывает только буфер своего процесса — записи других воркеров появятся в БД
+не позже чем через interval секунд. Неудачная запись (например, занятая блокировка
+записи SQLite) не теряется: пачка возвращается в буфер и пишется при следующем сбросе.
+"""
+import atexit
+import logging
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from .models import OperatorLog
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {"sync": False, "max_size": 100, "interval": 2.0}
+
+
+def _options():
+    return {**DEFAULTS, **getattr(settings, "OPERATOR_LOG_BUFFER", {})}
+
+
+class LogBuffer:
+    def __init__(self):
+        self._items = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def add(self, record: OperatorLog):
+        opts = _options()
+        if opts["sync"]:
+            record.save()
+            return
+
+        with self._lock:
+            self._items.append(record)
+            full = len(self._items) >= opts["max_size"]
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="operator-log-buffer", daemon=True)
+                self._thread.start()
+        if full:
+            self._wake.set()
+
+    def flush(self):
+        with self._lock:
+            items, self._items = self._items, []
+        if not items:
+            return 0
+        try:
+            # одной транзакцией: при ошибке в буфер вернётся вся пачка и ничего не задвоится
+            with transaction.atomic():
+                OperatorLog.objects.bulk_create(items, batch_size=500)
+        except Exception:
+            # вернём записи в буфер (но не бесконечно), попробуем в следующий раз;
+            # id, выданные откатившейся вставкой, сбрасываем — иначе повтор их задвоит
+            for record in items:
+                record.pk = None
+            with self._lock:
+                keep = max(_options()["max_size"] * 10 - len(self._items), 0)
+                self._items[:0] = items[:keep]
+            raise
+        return len(items)
+
+    def try_flush(self):
+        """flush() для пути запроса (выгрузка CSV): ошибка записи не превращается в 500."""
+        try:
+            return self.flush()
+        except Exception:
+            logger.exception("OperatorLog flush failed, records stay buffered")
+            return 0
+
+    def _run(self):
+        while True:
+            self._wake.wait(_options()["interval"])
+            self._wake.clear()
+            close_old_connections()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("OperatorLog flush failed")
+
+
+log_buffer = LogBuffer()
+
+# гарантированный сброс при остановке процесса
+atexit.register(log_buffer.try_flush)
+
+
+def log_event(operator_id, desk, action, ticket_number=None, meta=None):
+    """
+    Запись журнала в буфер — только после commit:
+    откат транзакции не оставит записи в журнале.
+    """
+    record = OperatorLog(
+        operator_id=operator_id,
+        desk=desk,
+        action=action,
+        ticket_number=ticket_number,
+        meta=(meta or {}),
+    )
+    transaction.on_commit(lambda: log_buffer.add(record))
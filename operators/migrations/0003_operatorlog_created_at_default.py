@@ -0,0 +1,19 @@
+# Generated by Django 6.0.2 on 2026-10-18 09:25
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('operators', '0002_operatorlog'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='operatorlog',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
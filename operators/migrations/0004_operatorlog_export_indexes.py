@@ -0,0 +1,23 @@
+# Generated by Django 6.0.2 on 2026-10-18 09:26
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('operators', '0003_operatorlog_created_at_default'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='operatorlog',
+            index=models.Index(fields=['operator', 'created_at'], name='oplog_operator_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='operatorlog',
+            index=models.Index(fields=['created_at'], name='oplog_created_idx'),
+        ),
+    ]
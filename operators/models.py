@@ -1,5 +1,6 @@
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 
 class OperatorProfile(models.Model):
     user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="operator_profile")
@@ -15,7 +16,15 @@ class OperatorLog(models.Model):
     action = models.CharField(max_length=32)
     ticket_number = models.CharField(max_length=32, blank=True, null=True)
     meta = models.JSONField(default=dict, blank=True)
-    created_at = models.DateTimeField(auto_now_add=True)
+    # время события, а не записи в БД (записи пишутся пачками, см. logbuffer)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            # выгрузка журнала: по оператору / целиком, новые сверху, с фильтром по датам
+            models.Index(fields=["operator", "created_at"], name="oplog_operator_created_idx"),
+            models.Index(fields=["created_at"], name="oplog_created_idx"),
+        ]
 
     def __str__(self):
         return f"{self.created_at} {self.operator} {self.action}"
@@ -1,3 +1,155 @@
-from django.test import TestCase
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.http import StreamingHttpResponse
+from django.test import TransactionTestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from tickets import throttling
+from tickets.desks import cancel_pending
+
+from .logbuffer import log_buffer
+from .models import OperatorLog, OperatorProfile
+
+
+class LogBufferTests(TransactionTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("operator1", password="p")
+        OperatorProfile.objects.create(user=self.user, desk=3)
+        self.client.force_login(self.user)
+        log_buffer.flush()
+
+    def buffer(self, action):
+        log_buffer.add(OperatorLog(operator=self.user, desk=3, action=action))
+
+    def test_export_survives_failed_flush(self):
+        self.buffer("CALL_NEXT")
+        with mock.patch.object(OperatorLog.objects, "bulk_create", side_effect=RuntimeError("database is locked")):
+            with self.assertLogs("operators.logbuffer", "ERROR"):
+                response = self.client.get("/operator/logs.csv")
+            self.assertEqual(response.status_code, 200)
+            b"".join(response.streaming_content)
+
+        # пачка осталась в буфере и записывается при следующем сбросе, без дублей
+        log_buffer.flush()
+        self.assertEqual(list(OperatorLog.objects.order_by("id").values_list("action", flat=True)),
+                         ["CALL_NEXT", "DOWNLOAD_LOGS"])
+
+
+class LogExportTests(TransactionTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("operator1", password="p")
+        OperatorProfile.objects.create(user=self.user, desk=3)
+        self.staff = User.objects.create_user("admin", password="p", is_staff=True)
+        log_buffer.flush()
+
+    def tearDown(self):
+        # DOWNLOAD_LOGS из буфера — до очистки БД между тестами
+        log_buffer.flush()
+
+    def export(self, path):
+        response = self.client.get(path)
+        self.assertIsInstance(response, StreamingHttpResponse)
+        return b"".join(response.streaming_content).decode().splitlines()
+
+    def test_export_has_no_row_cap(self):
+        now = timezone.now()
+        # больше прежнего лимита выгрузки оператора (5000 строк)
+        OperatorLog.objects.bulk_create(
+            OperatorLog(operator=self.user, desk=3, action="CALL_NEXT", created_at=now - timedelta(seconds=i))
+            for i in range(6000)
+        )
+        self.client.force_login(self.user)
+        lines = self.export("/operator/logs.csv")
+        # заголовок + все записи + сама выгрузка (DOWNLOAD_LOGS пишется после commit)
+        self.assertEqual(len(lines), 1 + 6000)
+        self.assertEqual(lines[0], "created_at,operator,desk,action,ticket_number,meta")
+        self.assertTrue(lines[1].startswith(timezone.localtime(now).strftime("%Y-%m-%d")))
+
+    def test_date_and_desk_filters(self):
+        today = timezone.localdate()
+        OperatorLog.objects.bulk_create(
+            OperatorLog(operator=self.user, desk=desk, action="CALL_NEXT", created_at=timezone.now() - timedelta(days=days))
+            for desk in (3, 4) for days in (0, 1, 2)
+        )
+        self.client.force_login(self.staff)
+        day = (today - timedelta(days=1)).isoformat()
+        lines = self.export(f"/operator/admin-logs.csv?from={day}&to={day}&desk=4")
+        self.assertEqual(len(lines), 2)
+        self.assertEqual(lines[1].split(",")[1:4], ["operator1", "4", "CALL_NEXT"])
+        self.assertEqual(len(self.export(f"/operator/admin-logs.csv?from={day}")), 1 + 4)
+
+
+class QueueJsonTests(TransactionTestCase):
+    def setUp(self):
+        throttling.memory_buckets._buckets.clear()
+        self.user = User.objects.create_user("operator1", password="p")
+        # desk 5 — группа "army" в config.json
+        OperatorProfile.objects.create(user=self.user, desk=5)
+        self.client.force_login(self.user)
+        self.ids = [self.create_ticket(i) for i in range(2)]
+
+    def tearDown(self):
+        log_buffer.flush()
+
+    @staticmethod
+    def create_ticket(i):
+        payload = {"service": "consultation", "category": "army", "fio": "Тест", "phone": f"8701000000{i}"}
+        return APIClient().post("/api/tickets/", payload, format="json").json()["id"]
+
+    def queue(self, version=None):
+        path = "/operator/queue.json" if version is None else f"/operator/queue.json?v={version}"
+        return self.client.get(path, HTTP_X_REQUESTED_WITH="XMLHttpRequest").json()
+
+    def test_full_then_not_modified(self):
+        full = self.queue()
+        self.assertFalse(full["delta"])
+        self.assertEqual([row["id"] for row in full["pending"]], self.ids)
+        self.assertEqual(self.queue(full["version"]), {"version": full["version"], "not_modified": True})
+
+    def test_delta_after_single_changes(self):
+        version = self.queue()["version"]
+        new_id = self.create_ticket(2)
+        APIClient().post(f"/api/tickets/{self.ids[0]}/cancel/", format="json")
+
+        delta = self.queue(version)
+        self.assertTrue(delta["delta"])
+        self.assertEqual([row["id"] for row in delta["upsert"]], [new_id])
+        self.assertEqual(delta["remove"], [self.ids[0]])
+
+    def test_bulk_change_falls_back_to_full_list(self):
+        version = self.queue()["version"]
+        cancel_pending(5)
+        full = self.queue(version)
+        self.assertFalse(full["delta"])
+        self.assertEqual(full["pending"], [])
+
+
+class QueueWaitTests(TransactionTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("operator1", password="p")
+        OperatorProfile.objects.create(user=self.user, desk=3)
+
+    def test_wsgi_answers_immediately(self):
+        import time
+        self.client.force_login(self.user)
+        started = time.monotonic()
+        data = self.client.get("/operator/queue-wait.json?v=0").json()
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertEqual((data["long_poll"], data["changed"]), (False, False))
+        self.assertGreater(data["retry"], 0)
+
+    def test_asgi_long_polls(self):
+        import asyncio
+        from django.test import AsyncClient, override_settings
+
+        async def scenario():
+            client = AsyncClient()
+            await client.aforce_login(self.user)
+            return (await client.get("/operator/queue-wait.json?v=0")).json()
+
+        with override_settings(QUEUE_WAIT_TIMEOUT=0.2, QUEUE_WAIT_POLL=0.1):
+            data = asyncio.run(scenario())
+        self.assertEqual((data["long_poll"], data["changed"]), (True, False))
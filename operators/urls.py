@@ -8,12 +8,18 @@ urlpatterns = [
     path("call-next/", views.operator_call_next, name="operator_call_next"),
     path("ticket/<int:ticket_id>/status/<str:new_status>/", views.operator_set_status, name="operator_set_status"),
 
+    # bulk (staff)
+    path("desk/<int:desk>/cancel-pending/", views.desk_cancel_pending, name="operator_desk_cancel_pending"),
+    path("desk/<int:desk>/reassign/<int:to_desk>/", views.desk_reassign, name="operator_desk_reassign"),
+    path("close-day/", views.close_service_day, name="operator_close_day"),
+
     # profile
     path("profile/", views.operator_profile, name="operator_profile"),
     path("password/", views.operator_password_change, name="operator_password_change"),
 
     # ajax
     path("queue.json", views.operator_queue_json, name="operator_queue_json"),
+    path("queue-wait.json", views.operator_queue_wait, name="operator_queue_wait"),
 
     # logs
     path("logs.csv", views.operator_logs_csv, name="operator_logs_csv"),
@@ -1,74 +1,31 @@
 import csv
-from datetime import datetime
+from datetime import datetime, time, timedelta
 
-from config.utils import is_enabled
+from config.utils import ais_enabled, is_enabled
 
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth import update_session_auth_hash
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib.auth.forms import PasswordChangeForm
+from django.core.handlers.asgi import ASGIRequest
 from django.db import transaction
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from django.shortcuts import render, redirect, get_object_or_404
+from django.utils import timezone
+from django.utils.dateparse import parse_date
 from django.views.decorators.http import require_POST, require_GET
 
+from tickets.desks import (
+    adesk_version, aqueue_changes, await_for_change, cancel_pending, close_day, reassign_pending, set_status,
+)
 from tickets.models import Ticket
+from tickets.projection import project, ticket_rows
+from tickets.routing import desk_group
+from .logbuffer import log_buffer, log_event
 from .models import OperatorProfile, OperatorLog
 
 
-# -------------------------
-# RU/KZ labels
-# -------------------------
-SERVICE_LABELS = {
-    "ru": {
-        "consultation": "Консультация",
-        "admission": "Поступление",
-        "contest": "Грант конкурс",
-        "online": "Онлайн поступление",
-    },
-    "kz": {
-        "consultation": "Кеңес алу",
-        "admission": "Оқуға түсу",
-        "contest": "Грант конкурсы",
-        "online": "Онлайн өтініш",
-    }
-}
-
-CATEGORY_LABELS = {
-    "ru": {
-        "after11": "После 11 класса",
-        "afterCollege": "После колледжа",
-        "foreign": "Иностранец",
-        "master": "Магистратура/Докторантура",
-        "masters": "Магистратура/Докторантура",
-        "army": "Военный",
-    },
-    "kz": {
-        "after11": "11 сыныптан кейін",
-        "afterCollege": "Колледжден кейін",
-        "foreign": "Шетел азаматы",
-        "master": "Магистратура/Докторантура",
-        "masters": "Магистратура/Докторантура",
-        "army": "Әскер",
-    }
-}
-
-STATUS_LABELS = {
-    "ru": {
-        "PENDING": "Ожидает",
-        "ACCEPTED": "Вызван",
-        "DONE": "Завершён",
-        "CANCELLED": "Отменён"
-    },
-    "kz": {
-        "PENDING": "Күтуде",
-        "ACCEPTED": "Шақырылды",
-        "DONE": "Аяқталды",
-        "CANCELLED": "Бас тартылды"
-    },
-}
-
-
 def get_lang(request):
     lang = request.GET.get("lang")
     if lang in ("ru", "kz"):
@@ -76,16 +33,11 @@ def get_lang(request):
     return request.session.get("op_lang", "ru")
 
 
-def t_service(service, lang):
-    return SERVICE_LABELS.get(lang, {}).get(service, service or "")
-
-
-def t_category(cat, lang):
-    return CATEGORY_LABELS.get(lang, {}).get(cat, cat or "")
-
-
-def t_status(st, lang):
-    return STATUS_LABELS.get(lang, {}).get(st, st or "")
+async def aget_lang(request):
+    lang = request.GET.get("lang")
+    if lang in ("ru", "kz"):
+        await request.session.aset("op_lang", lang)
+    return await request.session.aget("op_lang", "ru")
 
 
 def _is_ajax(request):
@@ -101,13 +53,7 @@ def _deny(request, ru_msg: str, kz_msg: str, status_code=403):
 
 
 def log_action(request, profile: OperatorProfile, action: str, ticket: Ticket = None, meta: dict = None):
-    OperatorLog.objects.create(
-        operator=request.user,
-        desk=profile.desk,
-        action=action,
-        ticket_number=(ticket.number if ticket else None),
-        meta=(meta or {}),
-    )
+    log_event(request.user.id, profile.desk, action, ticket_number=(ticket.number if ticket else None), meta=meta)
 
 
 def _get_profile(request):
@@ -117,6 +63,11 @@ def _get_profile(request):
         return None
 
 
+async def _aget_profile(request):
+    user = await request.auser()
+    return await OperatorProfile.objects.filter(user_id=user.id).afirst()
+
+
 def _flags_for_operator():
     return {
         "call_next": is_enabled("operator.call_next", True),
@@ -140,25 +91,15 @@ def operator_dashboard(request):
     lang = get_lang(request)
     flags = _flags_for_operator()
 
-    current = Ticket.objects.filter(
+    current = ticket_rows(project(Ticket.objects.filter(
         desk=profile.desk,
         status="ACCEPTED"
-    ).order_by("created_at").first()
+    ).order_by("created_at"))[:1], lang)
 
-    tickets = Ticket.objects.filter(
+    tickets = ticket_rows(project(Ticket.objects.filter(
         desk=profile.desk,
         status="PENDING"
-    ).order_by("created_at")
-
-    for t in tickets:
-        t.service_label = t_service(t.service, lang)
-        t.category_label = t_category(t.category, lang)
-        t.status_label = t_status(t.status, lang)
-
-    if current:
-        current.service_label = t_service(current.service, lang)
-        current.category_label = t_category(current.category, lang)
-        current.status_label = t_status(current.status, lang)
+    ).order_by("created_at")), lang)
 
     log_action(request, profile, "VIEW", meta={"lang": lang})
 
@@ -166,7 +107,7 @@ def operator_dashboard(request):
         "operator": request.user,
         "desk": profile.desk,
         "tickets": tickets,
-        "current": current,
+        "current": current[0] if current else None,
         "lang": lang,
         "flags": flags,   # ✅ важно для шаблона
     })
@@ -204,12 +145,25 @@ def operator_call_next(request):
         status="PENDING"
     ).order_by("created_at").first()
 
+    # своя очередь пуста — берём самый ранний PENDING у соседей по группе (config.json["desks"]);
+    # skip_locked: талон, который сейчас вызывает его оператор, пропускаем, а не ждём
+    stolen_from = None
+    if not t and is_enabled("operator.work_stealing", True):
+        siblings = desk_group(profile.desk)
+        if siblings:
+            t = Ticket.objects.select_for_update(skip_locked=True).filter(
+                desk__in=siblings,
+                status="PENDING"
+            ).order_by("created_at").first()
+            stolen_from = t.desk if t else None
+
     if not t:
         return _deny(request, "Нет талонов в очереди.", "Кезекте талон жоқ.", status_code=404)
 
-    t.status = "ACCEPTED"
-    t.save(update_fields=["status"])
+    set_status(t, "ACCEPTED", desk=profile.desk)
 
+    if stolen_from is not None:
+        log_action(request, profile, "STEAL", ticket=t, meta={"from_desk": stolen_from})
     log_action(request, profile, "CALL_NEXT", ticket=t, meta={"to": "ACCEPTED"})
 
     if _is_ajax(request):
@@ -253,9 +207,7 @@ def operator_set_status(request, ticket_id: int, new_status: str):
                 status_code=409
             )
 
-    old = t.status
-    t.status = new_status
-    t.save(update_fields=["status"])
+    old = set_status(t, new_status)
 
     log_action(request, profile, "SET_STATUS", ticket=t, meta={"from": old, "to": new_status})
 
@@ -266,6 +218,52 @@ def operator_set_status(request, ticket_id: int, new_status: str):
     return redirect("operator_dashboard")
 
 
+# -------------------------
+# Bulk actions (staff): закрытие desk / конец дня
+# -------------------------
+def _is_staff(u):
+    return u.is_staff or u.is_superuser
+
+
+@user_passes_test(_is_staff)
+@require_POST
+@transaction.atomic
+def desk_cancel_pending(request, desk: int):
+    """POST /operator/desk/3/cancel-pending/ -> все PENDING desk 3 отменены одним UPDATE"""
+    n = cancel_pending(desk)
+    log_event(request.user.id, desk, "BULK_CANCEL", meta={"count": n})
+    return JsonResponse({"ok": True, "desk": desk, "cancelled": n})
+
+
+@user_passes_test(_is_staff)
+@require_POST
+@transaction.atomic
+def desk_reassign(request, desk: int, to_desk: int):
+    """POST /operator/desk/3/reassign/5/ -> очередь desk 3 переходит на desk 5"""
+    try:
+        n = reassign_pending(desk, to_desk)
+    except ValueError as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+    log_event(request.user.id, desk, "BULK_REASSIGN", meta={"count": n, "to_desk": to_desk})
+    return JsonResponse({"ok": True, "desk": desk, "to_desk": to_desk, "moved": n})
+
+
+@user_passes_test(_is_staff)
+@require_POST
+@transaction.atomic
+def close_service_day(request):
+    """POST /operator/close-day/ [day=YYYY-MM-DD] -> закрывает все незавершённые талоны по этот день"""
+    raw = (request.POST.get("day") or "").strip()
+    day = parse_date(raw) if raw else timezone.localdate()
+    if day is None:
+        return JsonResponse({"error": "day must be YYYY-MM-DD"}, status=400)
+
+    cancelled, done = close_day(day)
+    # desk=0 — операция по всем desk
+    log_event(request.user.id, 0, "CLOSE_DAY", meta={"day": day.isoformat(), "cancelled": cancelled, "done": done})
+    return JsonResponse({"ok": True, "day": day.isoformat(), "cancelled": cancelled, "done": done})
+
+
 # -------------------------
 # Profile
 # -------------------------
@@ -321,52 +319,95 @@ def operator_password_change(request):
 # -------------------------
 # AJAX queue
 # -------------------------
+# async: под ASGI опрос очереди и long-poll не держат поток на каждого оператора
 @require_GET
 @login_required
-def operator_queue_json(request):
-    profile = _get_profile(request)
+async def operator_queue_json(request):
+    profile = await _aget_profile(request)
     if not profile:
         return JsonResponse({"error": "no profile"}, status=403)
 
-    if not is_enabled("operator.autorefresh", True):
+    if not await ais_enabled("operator.autorefresh", True):
         return JsonResponse({"error": "autorefresh disabled"}, status=403)
 
-    lang = get_lang(request)
+    lang = await aget_lang(request)
+    # версию читаем до талонов: если очередь изменится между запросами,
+    # следующий queue-wait вернётся сразу
+    version = await adesk_version(profile.desk)
+
+    since = request.GET.get("v") or ""
+    since = int(since) if since.isdigit() else None
+    if since is not None and since == version:
+        return JsonResponse({"version": version, "not_modified": True})
 
-    current = Ticket.objects.filter(
+    current = ticket_rows([row async for row in project(Ticket.objects.filter(
         desk=profile.desk,
         status="ACCEPTED"
-    ).order_by("created_at").first()
+    ).order_by("created_at"))[:1]], lang)
 
     pending = Ticket.objects.filter(
         desk=profile.desk,
         status="PENDING"
     ).order_by("created_at")
 
-    def to_dict(t: Ticket):
-        return {
-            "id": t.id,
-            "number": t.number,
-            "service": t.service,
-            "service_label": t_service(t.service, lang),
-            "category": t.category,
-            "category_label": t_category(t.category, lang),
-            "fio": t.fio,
-            "phone": t.phone,
-            "status": t.status,
-            "status_label": t_status(t.status, lang),
-            "desk": t.desk,
-            "created_at": t.created_at.isoformat() if t.created_at else None,
-        }
+    # ?v=N: только талоны, изменившиеся после версии N (добавлены/изменены -> upsert, ушли -> remove)
+    changed = await aqueue_changes(profile.desk, since, version)
+    if changed is not None:
+        upsert = ticket_rows([row async for row in project(pending.filter(id__in=changed))], lang)
+        return JsonResponse({
+            "lang": lang,
+            "desk": profile.desk,
+            "version": version,
+            "delta": True,
+            "current": current[0] if current else None,
+            "upsert": upsert,
+            "remove": sorted(changed - {row["id"] for row in upsert}),
+        })
 
     return JsonResponse({
         "lang": lang,
         "desk": profile.desk,
-        "current": to_dict(current) if current else None,
-        "pending": [to_dict(x) for x in pending],
+        "version": version,
+        "delta": False,
+        "current": current[0] if current else None,
+        "pending": ticket_rows([row async for row in project(pending)], lang),
     })
 
 
+@require_GET
+@login_required
+async def operator_queue_wait(request):
+    """
+    Long-poll вместо опроса каждые 3 секунды:
+    GET /operator/queue-wait.json?v=<version> отвечает, когда очередь desk
+    изменилась (changed=true) или по таймауту (changed=false).
+    Только под ASGI (atu_queue/asgi.py); под WSGI — сразу, с long_poll=false и retry.
+    """
+    profile = await _aget_profile(request)
+    if not profile:
+        return JsonResponse({"error": "no profile"}, status=403)
+
+    if not await ais_enabled("operator.autorefresh", True):
+        return JsonResponse({"error": "autorefresh disabled"}, status=403)
+
+    since = request.GET.get("v") or ""
+    since = int(since) if since.isdigit() else None
+
+    if not isinstance(request, ASGIRequest):
+        # под WSGI async-представление всё равно занимает поток воркера на всё ожидание —
+        # отвечаем сразу, а клиент повторит через retry секунд (обычный короткий опрос)
+        version = await adesk_version(profile.desk)
+        return JsonResponse({
+            "version": version,
+            "changed": version != since,
+            "long_poll": False,
+            "retry": getattr(settings, "QUEUE_WAIT_SHORT_POLL", 3),
+        })
+
+    version = await await_for_change(profile.desk, since)
+    return JsonResponse({"version": version, "changed": version != since, "long_poll": True})
+
+
 # -------------------------
 # Logs CSV
 # -------------------------
@@ -379,7 +420,9 @@ def operator_logs_csv(request):
     if not is_enabled("operator.download_logs", True):
         return _deny(request, "Скачивание журнала отключено админом.", "Журналды жүктеу әкімшімен өшірілген.")
 
-    qs = OperatorLog.objects.filter(operator=request.user).order_by("-created_at")[:5000]
+    # свои записи — сразу; записи других воркеров догонят за OPERATOR_LOG_BUFFER["interval"]
+    log_buffer.try_flush()
+    qs = _filter_by_dates(request, OperatorLog.objects.filter(operator=request.user)).order_by("-created_at")
     log_action(request, profile, "DOWNLOAD_LOGS", meta={"scope": "self"})
     return _logs_as_csv(qs, filename=f"operator_{request.user.username}_logs.csv")
 
@@ -389,6 +432,8 @@ def admin_logs_csv(request):
     username = (request.GET.get("username") or "").strip()
     desk = (request.GET.get("desk") or "").strip()
 
+    # свои записи — сразу; записи других воркеров догонят за OPERATOR_LOG_BUFFER["interval"]
+    log_buffer.try_flush()
     qs = OperatorLog.objects.all().order_by("-created_at")
 
     if username:
@@ -396,24 +441,51 @@ def admin_logs_csv(request):
     if desk.isdigit():
         qs = qs.filter(desk=int(desk))
 
-    qs = qs[:20000]
+    qs = _filter_by_dates(request, qs)
     return _logs_as_csv(qs, filename="operators_logs.csv")
 
 
+def _filter_by_dates(request, qs):
+    """?from=YYYY-MM-DD&to=YYYY-MM-DD (обе даты включительно)."""
+    date_from = parse_date((request.GET.get("from") or "").strip())
+    date_to = parse_date((request.GET.get("to") or "").strip())
+    tz = timezone.get_current_timezone()
+
+    if date_from:
+        qs = qs.filter(created_at__gte=timezone.make_aware(datetime.combine(date_from, time.min), tz))
+    if date_to:
+        qs = qs.filter(created_at__lt=timezone.make_aware(datetime.combine(date_to + timedelta(days=1), time.min), tz))
+    return qs
+
+
+class _Echo:
+    """csv.writer пишет сюда и сразу получает готовую строку."""
+    def write(self, value):
+        return value
+
+
 def _logs_as_csv(qs, filename: str):
-    response = HttpResponse(content_type="text/csv; charset=utf-8")
+    """
+    CSV отдаётся потоком: строки читаются из БД пачками (iterator) с логином оператора
+    через JOIN, так что память не растёт с размером журнала.
+    """
+    rows = qs.values_list(
+        "created_at", "operator__username", "desk", "action", "ticket_number", "meta"
+    ).iterator(chunk_size=2000)
+    writer = csv.writer(_Echo())
+
+    def stream():
+        yield writer.writerow(["created_at", "operator", "desk", "action", "ticket_number", "meta"])
+        for created_at, username, desk, action, ticket_number, meta in rows:
+            yield writer.writerow([
+                created_at.strftime("%Y-%m-%d %H:%M:%S") if created_at else "",
+                username or "",
+                desk,
+                action,
+                ticket_number or "",
+                meta or {},
+            ])
+
+    response = StreamingHttpResponse(stream(), content_type="text/csv; charset=utf-8")
     response["Content-Disposition"] = f'attachment; filename="{filename}"'
-
-    writer = csv.writer(response)
-    writer.writerow(["created_at", "operator", "desk", "action", "ticket_number", "meta"])
-
-    for row in qs:
-        writer.writerow([
-            row.created_at.strftime("%Y-%m-%d %H:%M:%S") if row.created_at else "",
-            getattr(row.operator, "username", ""),
-            row.desk,
-            row.action,
-            row.ticket_number or "",
-            row.meta or {},
-        ])
     return response
@@ -126,16 +126,17 @@ function getLastTicket() {
 // ----------------------
 async function loadConfig() {
   // base from static (desks routing)
+  // cache: "no-cache" — браузер всегда перепроверяет (ETag/Last-Modified), но тело качает только при изменении
   let base = null;
   try {
-    const r = await fetch("/static/config/config.json?ts=" + Date.now());
+    const r = await fetch("/static/config/config.json", { cache: "no-cache" });
     if (r.ok) base = await r.json();
   } catch (e) {}
 
   // admin overrides from DB
   let db = null;
   try {
-    const r2 = await fetch("/api/config/?ts=" + Date.now(), { cache: "no-store" });
+    const r2 = await fetch("/api/config/", { cache: "no-cache" });
     if (r2.ok) db = await r2.json();
   } catch (e) {}
 
@@ -197,18 +198,59 @@ function pickDeskForAdmission(payType, category, profile, cfg) {
 // ----------------------
 // API: create ticket in Django (DRF)
 // ----------------------
+// Idempotency-Key: один на выдачу талона; повторы после обрыва сети идут с тем же ключом,
+// и сервер вернёт уже выданный талон, а не второй.
+function makeIdempotencyKey() {
+  if (window.crypto && typeof crypto.randomUUID === "function") return crypto.randomUUID();
+  return Date.now().toString(36) + "-" + Math.random().toString(36).slice(2) + Math.random().toString(36).slice(2);
+}
+
+const CREATE_RETRIES = 3;
+
+function sleep(ms) {
+  return new Promise((resolve) => setTimeout(resolve, ms));
+}
+
 async function apiCreateTicket(ticket) {
-  const res = await fetch("/api/tickets/", {
-    method: "POST",
-    headers: { "Content-Type": "application/json" },
-    body: JSON.stringify(ticket),
-  });
-
-  if (!res.ok) {
-    const txt = await res.text();
-    throw new Error(txt || "API error");
+  const key = makeIdempotencyKey();
+  let lastError = null;
+
+  for (let attempt = 0; attempt <= CREATE_RETRIES; attempt++) {
+    if (attempt) await sleep(500 * 2 ** (attempt - 1));
+
+    let res;
+    try {
+      res = await fetch("/api/tickets/", {
+        method: "POST",
+        headers: { "Content-Type": "application/json", "Idempotency-Key": key },
+        body: JSON.stringify(ticket),
+      });
+    } catch (e) {
+      // сеть: запрос мог дойти до сервера — повторяем с тем же ключом
+      lastError = e;
+      continue;
+    }
+
+    if (res.status === 429) {
+      // лимит выдачи талонов: не ошибка API — просим повторить позже
+      const err = new Error("rate limited");
+      const minutes = Math.max(1, Math.ceil(Number(res.headers.get("Retry-After") || 60) / 60));
+      err.userMessage = window.I18N
+        ? I18N.t("ticket_rate_limited").replace("{minutes}", minutes)
+        : "Too many tickets, try again in " + minutes + " min";
+      throw err;
+    }
+    if (res.status >= 500) {
+      lastError = new Error((await res.text()) || "API error");
+      continue;
+    }
+    if (!res.ok) {
+      const txt = await res.text();
+      throw new Error(txt || "API error");
+    }
+    return await res.json();
   }
-  return await res.json();
+  throw lastError || new Error("API error");
 }
 
 // ----------------------
@@ -16,12 +16,13 @@ const I18N = (() => {
   async function load(){
     try{
       // 1) base texts from json
-      const res = await fetch(`/static/config/texts.${lang}.json`, { cache: "no-store" });
+      const res = await fetch(`/static/config/texts.${lang}.json`, { cache: "no-cache" });
       dict = await res.json();
 
       // 2) override texts from DB config
       try{
-        const r2 = await fetch(`/api/config/`, { cache: "no-store" });
+        // no-cache = перепроверка по ETag: без изменений сервер отвечает 304
+        const r2 = await fetch(`/api/config/`, { cache: "no-cache" });
         if(r2.ok){
           const cfg = await r2.json();
           const overrides = cfg?.ui?.[lang] || {};
@@ -1,8 +1,130 @@
-from django.contrib import admin
-from .models import Ticket
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ACTION_CHECKBOX_NAME
+from django.shortcuts import render
+from django.utils import timezone
+
+from operators.logbuffer import log_event
+from .desks import cancel_pending, close_day, reassign_pending, rebuild_counters, ticket_changed
+from .models import DeskQueue, ServiceTimeEstimate, Ticket, TicketArchive, TicketSequence
+from .routing import configured_desks
 
 @admin.register(Ticket)
 class TicketAdmin(admin.ModelAdmin):
     list_display = ("number", "service", "category", "desk", "fio", "phone", "status", "created_at")
     list_filter = ("service", "status", "category", "desk")
     search_fields = ("number", "fio", "phone")
+
+    def save_model(self, request, obj, form, change):
+        if "status" in form.changed_data:
+            if obj.status == "ACCEPTED" and not obj.accepted_at:
+                obj.accepted_at = timezone.now()
+            elif obj.status == "DONE" and not obj.done_at:
+                obj.done_at = timezone.now()
+        super().save_model(request, obj, form, change)
+        if not change:
+            ticket_changed(obj)
+        elif {"status", "desk"} & set(form.changed_data):
+            ticket_changed(obj, old_status=form.initial.get("status"), old_desk=form.initial.get("desk"))
+        elif form.changed_data:
+            # правка ФИО/телефона и т.п.: счётчики те же, но операторам нужна новая версия очереди
+            ticket_changed(obj, old_status=obj.status)
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        rebuild_counters()
+
+    def delete_queryset(self, request, queryset):
+        super().delete_queryset(request, queryset)
+        rebuild_counters()
+
+
+@admin.register(TicketSequence)
+class TicketSequenceAdmin(admin.ModelAdmin):
+    list_display = ("prefix", "period", "value")
+    list_filter = ("prefix",)
+    ordering = ("-period", "prefix")
+
+
+class ReassignForm(forms.Form):
+    """Промежуточная форма действия "Перенести PENDING": куда переносить."""
+    to_desk = forms.TypedChoiceField(label="На desk", coerce=int)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields["to_desk"].choices = [(d, d) for d in sorted(configured_desks())]
+
+
+@admin.register(DeskQueue)
+class DeskQueueAdmin(admin.ModelAdmin):
+    list_display = ("desk", "pending", "accepted")
+    ordering = ("desk",)
+    actions = ["cancel_pending_action", "reassign_pending_action", "close_day_action"]
+
+    @admin.action(description="Отменить все PENDING на выбранных desk")
+    def cancel_pending_action(self, request, queryset):
+        total = 0
+        for desk in queryset.values_list("desk", flat=True):
+            n = cancel_pending(desk)
+            log_event(request.user.id, desk, "BULK_CANCEL", meta={"count": n, "via": "admin"})
+            total += n
+        self.message_user(request, f"Отменено талонов: {total}", messages.SUCCESS)
+
+    @admin.action(description="Перенести PENDING с выбранных desk на другой desk")
+    def reassign_pending_action(self, request, queryset):
+        form = ReassignForm(request.POST if "apply" in request.POST else None)
+        if form.is_valid():
+            to_desk = form.cleaned_data["to_desk"]
+            total = 0
+            for desk in queryset.values_list("desk", flat=True):
+                n = reassign_pending(desk, to_desk)
+                log_event(request.user.id, desk, "BULK_REASSIGN", meta={"count": n, "to_desk": to_desk, "via": "admin"})
+                total += n
+            self.message_user(request, f"Перенесено на desk {to_desk}: {total}", messages.SUCCESS)
+            return None
+
+        # первый шаг (или неверный desk): страница выбора desk, выбранные строки — скрытыми полями
+        return render(request, "admin/tickets/deskqueue/reassign_pending.html", {
+            **self.admin_site.each_context(request),
+            "title": "Перенести очередь PENDING",
+            "opts": self.model._meta,
+            "queryset": queryset,
+            "form": form,
+            "action_checkbox_name": ACTION_CHECKBOX_NAME,
+        })
+
+    @admin.action(description="Закрыть день на выбранных desk: PENDING -> CANCELLED, ACCEPTED -> DONE")
+    def close_day_action(self, request, queryset):
+        day = timezone.localdate()
+        desks = list(queryset.values_list("desk", flat=True))
+        cancelled, done = close_day(day, desks=desks)
+        # одна запись, как у POST /operator/close-day/ (desk=0 — операция не по одному desk)
+        log_event(request.user.id, 0, "CLOSE_DAY", meta={
+            "day": day.isoformat(), "desks": desks, "cancelled": cancelled, "done": done, "via": "admin",
+        })
+        self.message_user(
+            request,
+            f"День {day} закрыт на desk {', '.join(map(str, desks))}: отменено {cancelled}, завершено {done}",
+            messages.SUCCESS,
+        )
+
+
+@admin.register(TicketArchive)
+class TicketArchiveAdmin(admin.ModelAdmin):
+    list_display = ("number", "service_day", "service", "desk", "fio", "status", "created_at")
+    list_filter = ("service", "status", "desk")
+    search_fields = ("number", "fio", "phone")
+    date_hierarchy = "service_day"
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ServiceTimeEstimate)
+class ServiceTimeEstimateAdmin(admin.ModelAdmin):
+    list_display = ("desk", "service", "avg_seconds", "samples")
+    list_filter = ("service",)
+    ordering = ("desk", "service")
@@ -1,61 +1,30 @@
-from django.db import transaction
+import base64
+from datetime import datetime
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date
 from rest_framework import serializers, viewsets, permissions
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.filters import BaseFilterBackend
+from rest_framework.pagination import BasePagination
 from rest_framework.response import Response
 from rest_framework import status as drf_status
+from rest_framework.utils.urls import replace_query_param
 
-from .models import Ticket
+from . import idempotency
+from .models import Ticket, TicketArchive, TicketSequence
+from .routing import route_desk
+from .desks import delete_ticket, estimated_wait, set_status, ticket_changed
+from .projection import project, ticket_row, ticket_rows
+from .throttling import TicketCreateThrottle
 
-import json, re
-from pathlib import Path
 from django.conf import settings
 
 
 # ---------- helpers ----------
-def load_cfg():
-    p = Path(settings.BASE_DIR) / "static" / "config" / "config.json"
-    if p.exists():
-        return json.loads(p.read_text(encoding="utf-8"))
-    return {}
-
-def pick_from(lst):
-    return lst[0] if lst else None
-
-def route_desk(ticket_data, cfg):
-    d = (cfg or {}).get("desks", {}) or {}
-
-    service = ticket_data.get("service")
-    category = ticket_data.get("category") or ""
-    track = ticket_data.get("track") or ""
-    profile = ticket_data.get("profile") or ""
-
-    if service == "online":
-        return None
-
-    if service == "consultation":
-        if track == "design":
-            return pick_from(d.get("design", []))
-        if category == "foreign":
-            return pick_from(d.get("foreign", []))
-        if category == "master":
-            return pick_from(d.get("master", []))
-        if category == "army":
-            return pick_from(d.get("army", []))
-        return pick_from(d.get("default", []))
-
-    if service in ("admission", "contest"):
-        if profile == "creative":
-            return pick_from(d.get("design", []))
-        if category == "foreign":
-            return pick_from(d.get("foreign", []))
-        if category == "master":
-            return pick_from(d.get("master", []))
-        if category == "army":
-            return pick_from(d.get("army", []))
-        return pick_from(d.get("default", []))
-
-    return pick_from(d.get("default", []))
-
 def prefix_for_service(service):
     return {
         "consultation": "C",
@@ -64,21 +33,44 @@ def prefix_for_service(service):
         "online": "O",
     }.get(service, "T")
 
-def next_number(prefix):
-    last = (
-        Ticket.objects
-        .filter(number__startswith=f"{prefix}-")
-        .order_by("-created_at")
-        .first()
-    )
-    if not last or not last.number:
-        return f"{prefix}-101"
-
-    m = re.search(r"-(\d+)$", last.number)
-    if not m:
-        return f"{prefix}-101"
-
-    n = int(m.group(1)) + 1
+def number_period(day):
+    """
+    Ключ периода нумерации: дата (сброс каждый день) или ключ сессии приёма.
+    TICKET_NUMBER_RESET = "daily" | "session", TICKET_NUMBER_SESSION = "2026-summer"
+    """
+    if getattr(settings, "TICKET_NUMBER_RESET", "daily") == "session":
+        return "s:" + (getattr(settings, "TICKET_NUMBER_SESSION", "") or "default")
+    return day.isoformat()
+
+def first_number(prefix, day):
+    """
+    Первый номер нового периода: 101 или, если в этот день номера с prefix уже выдавались
+    (сессия сменилась посреди дня, включили режим "session"), следующий после самого
+    большого из них — номер уникален в пределах service_day.
+    """
+    issued = Ticket.objects.filter(service_day=day, number__startswith=f"{prefix}-").values_list("number", flat=True)
+    taken = [int(n.rsplit("-", 1)[1]) for n in issued if n.rsplit("-", 1)[1].isdigit()]
+    return max([100, *taken]) + 1
+
+
+def next_number(prefix, day):
+    """
+    Атомарно увеличивает счётчик (prefix, period) и возвращает номер вида A-101.
+    Строка счётчика остаётся заблокированной до конца транзакции perform_create,
+    поэтому два киоска не получат один и тот же номер.
+    """
+    period = number_period(day)
+    seq = TicketSequence.objects.filter(prefix=prefix, period=period)
+
+    if not seq.update(value=F("value") + 1):
+        try:
+            with transaction.atomic():
+                TicketSequence.objects.create(prefix=prefix, period=period, value=first_number(prefix, day))
+        except IntegrityError:
+            # параллельный запрос успел создать строку — просто увеличиваем
+            seq.update(value=F("value") + 1)
+
+    n = seq.values_list("value", flat=True).get()
     return f"{prefix}-{n}"
 
 
@@ -87,7 +79,108 @@ class TicketSerializer(serializers.ModelSerializer):
     class Meta:
         model = Ticket
         fields = "__all__"
-        read_only_fields = ("number", "desk", "status", "created_at")
+        read_only_fields = ("number", "desk", "status", "created_at", "service_day", "accepted_at", "done_at")
+
+
+# ---------- pagination / filters ----------
+class KeysetPagination(BasePagination):
+    """
+    Keyset-пагинация по (created_at, id): ?cursor=<непрозрачный токен>&page_size=N.
+    Следующая страница — WHERE (created_at, id) после последней строки, без OFFSET,
+    поэтому стоимость не зависит от того, насколько далеко листают.
+    """
+    page_size = 50
+    max_page_size = 500
+    descending = True
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset, size = self.page_query(queryset, request)
+        return self.page_rows(list(queryset), size)
+
+    async def apaginate_queryset(self, queryset, request):
+        """То же для async-представлений (tickets.views)."""
+        queryset, size = self.page_query(queryset, request)
+        return self.page_rows([row async for row in queryset], size)
+
+    def page_query(self, queryset, request):
+        self.request = request
+        # DRF Request или обычный HttpRequest
+        params = getattr(request, "query_params", request.GET)
+        size = params.get("page_size") or ""
+        size = min(int(size), self.max_page_size) if size.isdigit() and int(size) > 0 else self.page_size
+
+        sign = "-" if self.descending else ""
+        queryset = queryset.order_by(f"{sign}created_at", f"{sign}id")
+
+        cursor = params.get("cursor")
+        if cursor:
+            created_at, pk = self.decode_cursor(cursor)
+            op = "lt" if self.descending else "gt"
+            queryset = queryset.filter(
+                Q(**{f"created_at__{op}": created_at}) | Q(created_at=created_at, **{f"id__{op}": pk})
+            )
+        return queryset[:size + 1], size
+
+    def page_rows(self, rows, size):
+        self.next_cursor = self.encode_cursor(rows[size - 1]) if len(rows) > size else None
+        return rows[:size]
+
+    def get_paginated_data(self, data):
+        next_url = None
+        if self.next_cursor:
+            next_url = replace_query_param(self.request.build_absolute_uri(), "cursor", self.next_cursor)
+        return {"next": next_url, "results": data}
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
+
+    @staticmethod
+    def encode_cursor(obj):
+        # obj — экземпляр Ticket или строка из .values()
+        if isinstance(obj, dict):
+            created_at, pk = obj["created_at"], obj["id"]
+        else:
+            created_at, pk = obj.created_at, obj.id
+        raw = f"{created_at.isoformat()}|{pk}"
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+
+    @staticmethod
+    def decode_cursor(cursor):
+        try:
+            created_at, pk = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+            return datetime.fromisoformat(created_at), int(pk)
+        except (ValueError, UnicodeError):
+            raise NotFound("Invalid cursor")
+
+
+class PendingPagination(KeysetPagination):
+    # очередь — от старых к новым
+    descending = False
+
+
+class TicketFilter(BaseFilterBackend):
+    """?status=PENDING&desk=3&service=admission&date_from=2026-07-01&date_to=2026-07-31"""
+
+    def filter_queryset(self, request, queryset, view):
+        params = getattr(request, "query_params", request.GET)
+
+        status = params.get("status")
+        if status:
+            queryset = queryset.filter(status=status)
+        desk = params.get("desk") or ""
+        if desk.isdigit():
+            queryset = queryset.filter(desk=int(desk))
+        service = params.get("service")
+        if service:
+            queryset = queryset.filter(service=service)
+
+        date_from = parse_date(params.get("date_from") or "")
+        if date_from:
+            queryset = queryset.filter(service_day__gte=date_from)
+        date_to = parse_date(params.get("date_to") or "")
+        if date_to:
+            queryset = queryset.filter(service_day__lte=date_to)
+        return queryset
 
 
 # ---------- viewset ----------
@@ -95,38 +188,112 @@ class TicketViewSet(viewsets.ModelViewSet):
     queryset = Ticket.objects.all().order_by("-created_at")
     serializer_class = TicketSerializer
     permission_classes = [permissions.AllowAny]  # прототип (потом закроем)
+    pagination_class = KeysetPagination
+    filter_backends = [TicketFilter]
+
+    def get_throttles(self):
+        # лимит только на выдачу талонов (по IP и телефону), чтение и действия операторов — без него
+        if self.action == "create":
+            return [TicketCreateThrottle()]
+        return super().get_throttles()
+
+    def filter_queryset(self, queryset):
+        # ?status=&desk=... — только для списков; get_object() (done/cancel и т.п.) ищет по одному pk
+        if self.action not in ("list", "archive"):
+            return queryset
+        return super().filter_queryset(queryset)
+
+    def list(self, request, *args, **kwargs):
+        """GET /api/tickets/ — постранично, через read-проекцию (без ModelSerializer на строку)."""
+        page = self.paginate_queryset(project(self.filter_queryset(self.get_queryset())))
+        return self.get_paginated_response(ticket_rows(page))
 
     @transaction.atomic
     def perform_create(self, serializer):
-        cfg = load_cfg()
         data = serializer.validated_data
 
         service = data.get("service")
         prefix = prefix_for_service(service)
+        day = timezone.localdate()
 
-        number = next_number(prefix)
-        desk = route_desk(data, cfg)
+        number = next_number(prefix, day)
+        desk = route_desk(data)
 
-        serializer.save(
+        t = serializer.save(
             number=number,
+            service_day=day,
             desk=desk,
             status="PENDING",
             is_online=(service == "online"),
         )
+        ticket_changed(t)
+        # для экрана талона (app/done.html); по счётчикам DeskQueue, без обхода очереди
+        self.estimated_wait = estimated_wait(t.desk, t.service)
+
+    @transaction.atomic
+    def perform_update(self, serializer):
+        # PUT/PATCH: как TicketAdmin.save_model — новая версия очереди desk и, если талон вызван, табло
+        old_status, old_desk = serializer.instance.status, serializer.instance.desk
+        t = serializer.save()
+        ticket_changed(t, old_status=old_status, old_desk=old_desk)
+
+    def perform_destroy(self, instance):
+        # DELETE /api/tickets/{id}/: счётчики DeskQueue и табло — вместе с удалением
+        delete_ticket(instance)
+
+    def create(self, request, *args, **kwargs):
+        """
+        Заголовок Idempotency-Key (необязательный): повтор запроса с тем же ключом
+        возвращает уже выданный талон, а не новый (см. tickets.idempotency).
+        Тот же ключ с другими данными -> 422.
+        """
+        key = request.headers.get(idempotency.HEADER, "").strip()
+        if len(key) > idempotency.MAX_LENGTH:
+            raise ValidationError({"detail": f"{idempotency.HEADER} too long"})
+
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        fingerprint = idempotency.fingerprint(serializer.validated_data)
+        if key:
+            stored = idempotency.lookup(key)
+            if stored is not None:
+                return self.replayed(stored, fingerprint)
+
+        try:
+            with transaction.atomic():
+                self.perform_create(serializer)
+                data = {**serializer.data, "estimated_wait": self.estimated_wait}
+                if key:
+                    idempotency.remember(key, fingerprint, data["id"], data)
+        except IntegrityError:
+            # тот же ключ только что записал параллельный повтор — наш талон откатился
+            stored = idempotency.lookup(key) if key else None
+            if stored is None:
+                raise
+            return self.replayed(stored, fingerprint)
+        return Response(data, status=drf_status.HTTP_201_CREATED, headers=self.get_success_headers(data))
+
+    @staticmethod
+    def replayed(stored, fingerprint):
+        stored_fingerprint, data = stored
+        if stored_fingerprint != fingerprint:
+            # ключ уже потрачен на другой запрос — чужой талон (ФИО, телефон) не отдаём
+            return Response(
+                {"detail": f"{idempotency.HEADER} was already used with a different request"},
+                status=drf_status.HTTP_422_UNPROCESSABLE_ENTITY,
+            )
+        return Response(data, status=drf_status.HTTP_201_CREATED, headers={"Idempotent-Replayed": "true"})
 
     # -----------------------
     # OPERATOR ACTIONS
     # -----------------------
 
-    @action(detail=False, methods=["get"], url_path="pending")
-    def pending(self, request):
-        """GET /api/tickets/pending/?desk=3 -> список PENDING по desk"""
-        desk = request.query_params.get("desk")
-        qs = Ticket.objects.filter(status="PENDING")
-        if desk:
-            qs = qs.filter(desk=int(desk))
-        qs = qs.order_by("created_at")
-        return Response(TicketSerializer(qs, many=True).data)
+    @action(detail=False, methods=["get"], url_path="archive")
+    def archive(self, request):
+        """GET /api/tickets/archive/?date_from=2026-07-01&desk=3 -> закрытые талоны прошлых дней (постранично)"""
+        qs = self.filter_queryset(TicketArchive.objects.all())
+        page = self.paginate_queryset(project(qs))
+        return self.get_paginated_response(ticket_rows(page))
 
     @action(detail=False, methods=["post"], url_path="next")
     @transaction.atomic
@@ -150,37 +317,21 @@ class TicketViewSet(viewsets.ModelViewSet):
         if not t:
             return Response({"detail": "no pending tickets"}, status=drf_status.HTTP_404_NOT_FOUND)
 
-        t.status = "ACCEPTED"
-        t.save(update_fields=["status"])
-        return Response(TicketSerializer(t).data)
+        set_status(t, "ACCEPTED")
+        return Response(ticket_row(t))
 
     @action(detail=True, methods=["post"], url_path="done")
+    @transaction.atomic
     def done(self, request, pk=None):
         """POST /api/tickets/{id}/done/ -> DONE"""
         t = self.get_object()
-        t.status = "DONE"
-        t.save(update_fields=["status"])
-        return Response(TicketSerializer(t).data)
+        set_status(t, "DONE")
+        return Response(ticket_row(t))
 
     @action(detail=True, methods=["post"], url_path="cancel")
+    @transaction.atomic
     def cancel(self, request, pk=None):
         """POST /api/tickets/{id}/cancel/ -> CANCELLED"""
         t = self.get_object()
-        t.status = "CANCELLED"
-        t.save(update_fields=["status"])
-        return Response(TicketSerializer(t).data)
-
-    @action(detail=False, methods=["get"], url_path="board")
-    def board(self, request):
-        """
-        GET /api/tickets/board/
-        Возвращает текущие ACCEPTED по desk (по последнему принятому)
-        """
-        accepted = Ticket.objects.filter(status="ACCEPTED").order_by("-created_at")
-        result = {}
-        for t in accepted:
-            if t.desk is None:
-                continue
-            if str(t.desk) not in result:
-                result[str(t.desk)] = TicketSerializer(t).data
-        return Response(result)
+        set_status(t, "CANCELLED")
+        return Response(ticket_row(t))
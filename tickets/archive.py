@@ -0,0 +1,43 @@
+"""
+Перенос закрытых талонов прошлых дней из Ticket в TicketArchive
+(manage.py rollover_tickets). Живая очередь и табло не затрагиваются:
+переносятся только DONE/CANCELLED, поэтому DeskQueue пересчитывать не нужно.
+"""
+from django.db import transaction
+
+from .models import BoardEvent, QueueEvent, RateBucket, Ticket, TicketArchive, TicketSequence
+from .projection import FIELDS
+
+
+CLOSED = ("DONE", "CANCELLED")
+
+
+def closed_before(day):
+    return Ticket.objects.filter(status__in=CLOSED, service_day__lt=day)
+
+
+def rollover(before, chunk_size=1000):
+    """
+    Переносит талоны со service_day < before пачками по chunk_size:
+    каждая пачка — своя короткая транзакция (INSERT в архив + DELETE из Ticket),
+    чтобы не держать блокировку на всю таблицу. Возвращает число перенесённых.
+    """
+    moved = 0
+    while True:
+        with transaction.atomic():
+            ids = list(closed_before(before).order_by("id").values_list("id", flat=True)[:chunk_size])
+            if not ids:
+                break
+            rows = Ticket.objects.filter(id__in=ids).values(*FIELDS)
+            TicketArchive.objects.bulk_create([TicketArchive(**row) for row in rows])
+            Ticket.objects.filter(id__in=ids).delete()
+        moved += len(ids)
+
+    # счётчики номеров прошлых дней больше не нужны (сессионные "s:..." не трогаем)
+    TicketSequence.objects.filter(period__lt=before.isoformat()).exclude(period__startswith="s:").delete()
+    # журнал изменений очередей прошлых дней тоже (клиенты со старой версией получат полный список)
+    QueueEvent.objects.filter(created_at__date__lt=before).delete()
+    BoardEvent.objects.filter(created_at__date__lt=before).delete()
+    # корзины ограничителя, не тронутые с прошлых дней, давно полные — строка не нужна
+    RateBucket.objects.filter(updated_at__date__lt=before).delete()
+    return moved
@@ -0,0 +1,100 @@
+"""
+Общие помощники для бенчмарков (manage.py bench_ticket_queries и др.).
+Всё выполняется в отдельной тестовой БД, рабочая db.sqlite3 не трогается.
+"""
+import random
+import statistics
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from pathlib import Path
+
+from django.db import connection
+from django.utils import timezone
+
+from .models import Ticket
+
+
+DESKS = list(range(1, 26))
+SERVICES = [("consultation", "C"), ("admission", "A"), ("contest", "G")]
+CATEGORIES = ["after11", "afterCollege", "foreign", "master", "army"]
+
+
+@contextmanager
+def scratch_database(keepdb=False, verbosity=0):
+    """
+    Создаёт test_<NAME> со всеми миграциями и переключает на неё соединение.
+    Для SQLite база создаётся файлом во временной папке (а не в памяти),
+    чтобы планы и блокировки были как у настоящей установки.
+    """
+    settings_dict = connection.settings_dict
+    if connection.vendor == "sqlite" and not settings_dict["TEST"].get("NAME"):
+        settings_dict["TEST"]["NAME"] = str(Path(tempfile.gettempdir()) / "atu_queue_bench.sqlite3")
+
+    old_name = settings_dict["NAME"]
+    connection.creation.create_test_db(verbosity=verbosity, autoclobber=True, serialize=False, keepdb=keepdb)
+    try:
+        yield settings_dict["NAME"]
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=verbosity, keepdb=keepdb)
+
+
+def seed_tickets(total, pending_per_desk=20, days=60, batch_size=5000, seed=42):
+    """
+    Заполняет таблицу историей за `days` дней: почти всё DONE/CANCELLED,
+    плюс живая очередь — pending_per_desk PENDING и один ACCEPTED на каждый desk.
+    """
+    rnd = random.Random(seed)
+    today = timezone.localdate()
+    live = len(DESKS) * (pending_per_desk + 1)
+    history = max(total - live, 0)
+
+    def make(i, status, day, desk):
+        service, prefix = rnd.choice(SERVICES)
+        return Ticket(
+            number=f"{prefix}-{101 + i}",
+            service=service,
+            category=rnd.choice(CATEGORIES),
+            desk=desk,
+            fio=f"Applicant {i}",
+            phone=f"+7700{i:07d}",
+            status=status,
+            service_day=day,
+        )
+
+    batch = []
+    for i in range(history):
+        day = today - timedelta(days=1 + i * days // max(history, 1))
+        status = "DONE" if rnd.random() < 0.9 else "CANCELLED"
+        batch.append(make(i, status, day, rnd.choice(DESKS)))
+        if len(batch) >= batch_size:
+            Ticket.objects.bulk_create(batch)
+            batch = []
+
+    i = history
+    for desk in DESKS:
+        batch.append(make(i, "ACCEPTED", today, desk))
+        i += 1
+        for _ in range(pending_per_desk):
+            batch.append(make(i, "PENDING", today, desk))
+            i += 1
+    Ticket.objects.bulk_create(batch, batch_size=batch_size)
+    return i
+
+
+def percentile(sorted_samples, p):
+    if not sorted_samples:
+        return 0.0
+    return sorted_samples[min(len(sorted_samples) - 1, int(len(sorted_samples) * p / 100))]
+
+
+def timed(fn, repeat):
+    """Выполняет fn() repeat раз, возвращает (median_ms, p95_ms)."""
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    samples.sort()
+    return statistics.median(samples), percentile(samples, 95)
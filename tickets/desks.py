@@ -0,0 +1,403 @@
+import asyncio
+import threading
+import time
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+
+from . import metrics
+from .models import BoardEvent, DeskQueue, QueueEvent, ServiceTimeEstimate, Ticket
+from .projection import ticket_row
+
+
+_UNCHANGED = object()
+
+# переходы, которые видит табло в зале (tickets.hub рассылает их по /ws/board/)
+BOARD_STATUSES = ("ACCEPTED", "DONE", "CANCELLED")
+
+# будит ожидающих await_for_change() в этом процессе сразу после commit;
+# изменения из других процессов они видят по version в БД.
+# (event loop, asyncio.Event) каждого ожидающего
+_waiters = set()
+_waiters_lock = threading.Lock()
+
+
+def _notify():
+    with _waiters_lock:
+        for loop, event in _waiters:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                # loop уже закрыт, ожидающий вот-вот уберёт себя сам
+                pass
+
+
+def _touch(desk, delta, accepted_delta=0, ticket_id=None):
+    """
+    pending += delta, accepted += accepted_delta и version += 1 для desk одним UPDATE
+    плюс QueueEvent с новой версией (ticket_id=None — массовое изменение).
+    """
+    if desk is None:
+        return
+    transaction.on_commit(_notify)
+    changes = {
+        "pending": F("pending") + delta,
+        "accepted": F("accepted") + accepted_delta,
+        "version": F("version") + 1,
+    }
+    if not DeskQueue.objects.filter(desk=desk).update(**changes):
+        # первая запись для этого desk — один раз считаем по таблице
+        # (талон уже сохранён, так что delta в подсчёте уже учтена)
+        def counts():
+            return {
+                "pending": Ticket.objects.filter(desk=desk, status="PENDING").count(),
+                "accepted": Ticket.objects.filter(desk=desk, status="ACCEPTED").count(),
+            }
+
+        try:
+            with transaction.atomic():
+                # версии начинаются заново — старые события desk больше не годятся
+                QueueEvent.objects.filter(desk=desk).delete()
+                DeskQueue.objects.create(desk=desk, version=1, **counts())
+        except IntegrityError:
+            # строку только что создал параллельный запрос по своему подсчёту, который мог уже
+            # включать и наш талон — delta второй раз не прибавляем, а пересчитываем заново
+            DeskQueue.objects.filter(desk=desk).update(version=F("version") + 1, **counts())
+
+    # строка DeskQueue заблокирована нашим UPDATE до commit, так что версия — наша
+    version = DeskQueue.objects.filter(desk=desk).values_list("version", flat=True).get()
+    QueueEvent.objects.create(desk=desk, version=version, ticket_id=ticket_id)
+
+
+def ticket_changed(ticket, old_status=None, old_desk=_UNCHANGED):
+    """
+    Вызывается после сохранения талона: при создании (old_status=None),
+    смене статуса или переносе на другой desk. Держит счётчики и версии DeskQueue
+    в актуальном виде.
+    """
+    if old_desk is _UNCHANGED:
+        old_desk = ticket.desk
+
+    was_pending = old_status == "PENDING"
+    is_pending = ticket.status == "PENDING"
+    was_accepted = old_status == "ACCEPTED"
+    is_accepted = ticket.status == "ACCEPTED"
+    moved = old_desk != ticket.desk
+
+    if not moved:
+        _touch(ticket.desk, int(is_pending) - int(was_pending), int(is_accepted) - int(was_accepted), ticket.id)
+    else:
+        _touch(old_desk, -int(was_pending), -int(was_accepted), ticket.id)
+        _touch(ticket.desk, int(is_pending), int(is_accepted), ticket.id)
+
+    if was_accepted and (moved or not is_accepted):
+        _release_current(old_desk, ticket)
+    if is_accepted and (moved or not was_accepted):
+        _set_current(ticket.desk, ticket)
+    elif is_accepted:
+        # правка уже вызванного талона (номер, ФИО в админке): обновить его на табло
+        _refresh_current(ticket.desk, ticket)
+    if old_status is not None and old_status != ticket.status and ticket.status in BOARD_STATUSES:
+        BoardEvent.objects.create(desk=ticket.desk, ticket_id=ticket.id, number=ticket.number, status=ticket.status)
+
+    # метрики — только после commit, откат не должен их менять
+    if old_status is None:
+        service = ticket.service
+        transaction.on_commit(lambda: metrics.TICKETS_CREATED.inc(service=service))
+    elif was_pending and is_accepted and ticket.created_at:
+        waited, desk = (timezone.now() - ticket.created_at).total_seconds(), ticket.desk
+        transaction.on_commit(lambda: metrics.WAIT_SECONDS.observe(waited, desk=desk))
+
+
+@transaction.atomic
+def delete_ticket(ticket):
+    """Удаляет талон и убирает его из счётчиков desk, а если он был вызван — и с табло."""
+    ticket_id = ticket.id
+    # статус и desk — из заблокированной строки: талон могли вызвать, пока его удаляли
+    status, ticket.desk = Ticket.objects.select_for_update().filter(id=ticket_id).values_list("status", "desk").get()
+    ticket.delete()
+    _touch(ticket.desk, -int(status == "PENDING"), -int(status == "ACCEPTED"), ticket_id)
+    if status == "ACCEPTED":
+        ticket.id = ticket_id
+        _release_current(ticket.desk, ticket)
+        BoardEvent.objects.create(desk=ticket.desk, ticket_id=ticket_id, number=ticket.number, status="CANCELLED")
+
+
+# -------------------------
+# Board (текущий талон на каждом desk)
+# -------------------------
+def _set_current(desk, ticket):
+    if desk is None:
+        return
+    DeskQueue.objects.filter(desk=desk).update(current=ticket_row(ticket))
+
+
+def _refresh_current(desk, ticket):
+    if desk is None:
+        return
+    DeskQueue.objects.filter(desk=desk, current__id=ticket.id).update(current=ticket_row(ticket))
+
+
+def _release_current(desk, ticket):
+    """Убирает талон с табло desk; если на desk есть другой ACCEPTED — показываем его."""
+    if desk is None:
+        return
+    other = (
+        Ticket.objects
+        .filter(desk=desk, status="ACCEPTED")
+        .exclude(id=ticket.id)
+        .order_by("-created_at")
+        .first()
+    )
+    DeskQueue.objects.filter(desk=desk, current__id=ticket.id).update(current=ticket_row(other) if other else None)
+
+
+async def aboard_version():
+    """
+    Версия табло для ETag /api/tickets/board/. current меняется только вместе с version
+    своего desk (_touch в том же переходе, rebuild_counters), поэтому хватает суммы версий
+    (и числа строк — на случай удаления строки DeskQueue). Без общей строки-счётчика:
+    вызовы на разных desk не ждут друг друга на её блокировке.
+    """
+    row = await DeskQueue.objects.aaggregate(rows=Count("id"), versions=Sum("version"))
+    return f"{row['rows']}-{row['versions'] or 0}"
+
+
+async def aboard_snapshot():
+    """{desk: талон} для /api/tickets/board/ — по одной строке на desk, без обхода истории."""
+    return {
+        str(desk): current
+        async for desk, current in DeskQueue.objects.filter(current__isnull=False).values_list("desk", "current")
+    }
+
+
+def set_status(ticket, new_status, desk=_UNCHANGED):
+    """
+    Меняет статус талона и обновляет состояние desk. Возвращает прежний статус.
+    Проставляет accepted_at / done_at; на DONE обновляет оценку времени обслуживания.
+    desk — заодно перенести талон на этот desk (вызов чужого талона из той же группы).
+    """
+    old, old_desk = ticket.status, ticket.desk
+    ticket.status = new_status
+    fields = ["status"]
+    if desk is not _UNCHANGED and desk != old_desk:
+        ticket.desk = desk
+        fields.append("desk")
+    if new_status != old:
+        now = timezone.now()
+        if new_status == "ACCEPTED":
+            ticket.accepted_at = now
+            fields.append("accepted_at")
+        elif new_status == "DONE":
+            ticket.done_at = now
+            fields.append("done_at")
+    ticket.save(update_fields=fields)
+    ticket_changed(ticket, old_status=old, old_desk=old_desk)
+
+    if new_status == "DONE" and old == "ACCEPTED" and ticket.accepted_at:
+        record_service_time(ticket.desk, ticket.service, (ticket.done_at - ticket.accepted_at).total_seconds())
+    return old
+
+
+# -------------------------
+# Оценка времени обслуживания и ожидания
+# -------------------------
+def _estimator_options():
+    return {"alpha": 0.2, "default": 300, "max": 3600, **getattr(settings, "SERVICE_TIME_ESTIMATOR", {})}
+
+
+def record_service_time(desk, service, seconds):
+    """EWMA: avg += alpha * (seconds - avg) — одним UPDATE, без чтения строки."""
+    if desk is None or seconds <= 0:
+        return
+    opts = _estimator_options()
+    # забытый на весь день талон не должен испортить оценку
+    seconds = min(seconds, opts["max"])
+    estimates = ServiceTimeEstimate.objects.filter(desk=desk, service=service)
+    changes = {"avg_seconds": F("avg_seconds") + opts["alpha"] * (seconds - F("avg_seconds")), "samples": F("samples") + 1}
+    if estimates.update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            ServiceTimeEstimate.objects.create(desk=desk, service=service, avg_seconds=seconds)
+    except IntegrityError:
+        estimates.update(**changes)
+
+
+def estimated_wait(desk, service):
+    """
+    Ожидание для только что выданного талона, секунды:
+    (очередь перед ним + те, кого обслуживают сейчас) * среднее время обслуживания.
+    Два запроса по маленьким таблицам (DeskQueue и ServiceTimeEstimate), без обхода Ticket.
+    """
+    if desk is None:
+        return None
+    queue = DeskQueue.objects.filter(desk=desk).values_list("pending", "accepted").first() or (0, 0)
+    # сам новый талон уже учтён в pending
+    ahead = max(queue[0] - 1, 0) + queue[1]
+
+    averages = dict(ServiceTimeEstimate.objects.filter(desk=desk).values_list("service", "avg_seconds"))
+    if service in averages:
+        avg = averages[service]
+    elif averages:
+        avg = sum(averages.values()) / len(averages)
+    else:
+        avg = _estimator_options()["default"]
+    return round(ahead * avg)
+
+
+# -------------------------
+# Массовые операции (закрытие desk / конец дня): один UPDATE на всё множество талонов
+# -------------------------
+def _board_reset():
+    """Массовое изменение: экраны на /ws/board/ перечитывают снимок целиком."""
+    BoardEvent.objects.create(status="RESET")
+
+
+@transaction.atomic
+def cancel_pending(desk):
+    """Все PENDING на desk -> CANCELLED. Возвращает число отменённых."""
+    n = Ticket.objects.filter(desk=desk, status="PENDING").update(status="CANCELLED")
+    if n:
+        _touch(desk, -n)
+        _board_reset()
+    return n
+
+
+@transaction.atomic
+def reassign_pending(from_desk, to_desk):
+    """
+    Переносит очередь PENDING с from_desk на to_desk (порядок по created_at сохраняется).
+    to_desk должен быть в config.json["desks"], иначе ValueError.
+    """
+    from .routing import configured_desks
+
+    if to_desk not in configured_desks():
+        raise ValueError(f"desk {to_desk} is not configured")
+    if from_desk == to_desk:
+        return 0
+    n = Ticket.objects.filter(desk=from_desk, status="PENDING").update(desk=to_desk)
+    if n:
+        _touch(from_desk, -n)
+        _touch(to_desk, n)
+        _board_reset()
+    return n
+
+
+@transaction.atomic
+def close_day(day, desks=None):
+    """
+    Закрывает все незавершённые талоны со service_day <= day (только на desks, если заданы):
+    PENDING -> CANCELLED, ACCEPTED (уже у оператора) -> DONE.
+    Возвращает (cancelled, done).
+    """
+    open_tickets = Ticket.objects.filter(service_day__lte=day)
+    if desks is not None:
+        open_tickets = open_tickets.filter(desk__in=desks)
+    cancelled = open_tickets.filter(status="PENDING").update(status="CANCELLED")
+    done = open_tickets.filter(status="ACCEPTED").update(status="DONE", done_at=timezone.now())
+    if cancelled or done:
+        # затронуты все desk и табло — пересчёт по оставшимся живым талонам дешевле точечных правок
+        rebuild_counters()
+    return cancelled, done
+
+
+def least_loaded(desks):
+    """
+    desk из группы с самой короткой очередью PENDING (один запрос на всю группу).
+    При равенстве — первый по порядку в config.json.
+    """
+    if not desks:
+        return None
+    if len(desks) == 1:
+        return desks[0]
+    loads = dict(DeskQueue.objects.filter(desk__in=desks).values_list("desk", "pending"))
+    return min(desks, key=lambda d: loads.get(d, 0))
+
+
+async def aqueue_changes(desk, since, version):
+    """
+    id талонов desk, изменившихся в версиях (since, version], или None,
+    если по журналу это не восстановить (массовая операция, пересчёт, события удалены)
+    — тогда клиенту нужен полный список.
+    """
+    if since is None or since > version:
+        return None
+    events = QueueEvent.objects.filter(desk=desk, version__gt=since, version__lte=version)
+    events = [e async for e in events.values_list("version", "ticket_id")]
+    if len(events) != version - since or any(ticket_id is None for _, ticket_id in events):
+        return None
+    return {ticket_id for _, ticket_id in events}
+
+
+async def adesk_version(desk):
+    return (await DeskQueue.objects.filter(desk=desk).values_list("version", flat=True).afirst()) or 0
+
+
+async def await_for_change(desk, since, timeout=None):
+    """
+    Long-poll: ждёт, пока version desk не станет отличной от since, но не дольше timeout.
+    Между проверками спит на asyncio.Event (будится коммитами этого процесса),
+    а БД перечитывает не чаще раза в QUEUE_WAIT_POLL секунд.
+    Под ASGI ожидание не занимает поток: открытые long-poll держит один event loop.
+    """
+    if timeout is None:
+        timeout = getattr(settings, "QUEUE_WAIT_TIMEOUT", 25)
+    poll = getattr(settings, "QUEUE_WAIT_POLL", 2)
+    deadline = time.monotonic() + timeout
+
+    waiter = (asyncio.get_running_loop(), asyncio.Event())
+    with _waiters_lock:
+        _waiters.add(waiter)
+    try:
+        while True:
+            version = await adesk_version(desk)
+            remaining = deadline - time.monotonic()
+            if version != since or remaining <= 0:
+                return version
+            waiter[1].clear()
+            try:
+                await asyncio.wait_for(waiter[1].wait(), min(poll, remaining))
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        with _waiters_lock:
+            _waiters.discard(waiter)
+
+
+def rebuild_counters():
+    """Пересчитывает DeskQueue (очереди и табло) по таблице Ticket — после ручных правок в БД и т.п."""
+    def count_by_desk(status):
+        return dict(
+            Ticket.objects
+            .filter(status=status, desk__isnull=False)
+            .values_list("desk")
+            .annotate(n=Count("id"))
+        )
+
+    counts = count_by_desk("PENDING")
+    accepted = count_by_desk("ACCEPTED")
+    with transaction.atomic():
+        DeskQueue.objects.exclude(desk__in=counts.keys() | accepted.keys()).update(
+            pending=0, accepted=0, version=F("version") + 1
+        )
+        for desk in counts.keys() | accepted.keys():
+            row = {"pending": counts.get(desk, 0), "accepted": accepted.get(desk, 0)}
+            if not DeskQueue.objects.filter(desk=desk).update(**row, version=F("version") + 1):
+                QueueEvent.objects.filter(desk=desk).delete()
+                DeskQueue.objects.create(desk=desk, **row, version=1)
+
+        current = {}
+        for t in Ticket.objects.filter(status="ACCEPTED", desk__isnull=False).order_by("created_at"):
+            current[t.desk] = t
+        DeskQueue.objects.exclude(desk__in=current).update(current=None)
+        for desk, t in current.items():
+            if not DeskQueue.objects.filter(desk=desk).update(current=ticket_row(t)):
+                DeskQueue.objects.create(desk=desk, current=ticket_row(t), version=1)
+        # табло пересобрано целиком — экраны перечитывают снимок
+        _board_reset()
+
+        transaction.on_commit(_notify)
+    return counts
@@ -0,0 +1,229 @@
+"""
+Рассылка событий табло экранам в зале по одному WebSocket (/ws/board/, см. atu_queue/asgi.py).
+
+Каждый переход талона в ACCEPTED / DONE / CANCELLED пишется в BoardEvent
+(tickets.desks.ticket_changed) — так события из любых процессов и представлений
+(operator_call_next, operator_set_status, next/done/cancel API) попадают в один журнал.
+В каждом ASGI-процессе один фоновый BoardHub читает новые BoardEvent (будится коммитами
+этого процесса, изменения из других процессов видит не позже BOARD_HUB["poll"] секунд)
+и раздаёт их всем подключённым экранам. Экран — это одно соединение, а не цикл опроса.
+
+Протокол (сервер -> экран, JSON):
+    {"type": "snapshot", "seq": N, "board": {desk: талон}}    — при подключении и после RESET
+    {"type": "event", "seq": N, "desk": 3, "ticket_id": 15, "number": "A-101",
+     "status": "ACCEPTED", "at": "..."}
+Экран запоминает наибольший полученный seq (в Postgres события изредка приходят
+не по порядку seq) и переподключается с /ws/board/?since=<seq>:
+если пропущенное ещё в буфере, приходят только недостающие события, иначе — снимок.
+"""
+import asyncio
+import json
+import logging
+import weakref
+from collections import deque
+from datetime import timedelta
+from urllib.parse import parse_qs
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from . import desks
+from .desks import aboard_snapshot
+from .models import BoardEvent
+from .projection import iso_datetime
+
+
+logger = logging.getLogger(__name__)
+
+
+def _options():
+    return {"buffer": 200, "poll": 1.0, "client_queue": 100, "late": 10.0, **getattr(settings, "BOARD_HUB", {})}
+
+
+class BoardHub:
+    """
+    Буфер последних событий табло и очереди подключённых экранов.
+    Один на event loop процесса (см. get_hub): очереди asyncio привязаны к своему loop.
+    """
+
+    def __init__(self, loop):
+        opts = _options()
+        self.opts = opts
+        self.clients = set()
+        self.buffer = deque(maxlen=opts["buffer"])
+        self.last = 0
+        # id уже разосланных событий за последние "late" секунд -> created_at
+        self.seen = {}
+        self.seeded = False
+        self._loop = loop
+        self._task = None
+        self._ready = asyncio.Event()
+
+    async def start(self):
+        """Запускает фоновое чтение BoardEvent при первом подключении (и заново, если оно упало)."""
+        if self._task is None or self._task.done():
+            self._task = self._loop.create_task(self._run())
+        await self._ready.wait()
+
+    async def _seed(self):
+        # буфер начинаем с хвоста журнала: экраны, переподключившиеся после рестарта процесса,
+        # тоже получают только недостающее
+        tail = [e async for e in BoardEvent.objects.order_by("-id")[:self.opts["buffer"]]]
+        self.last = tail[0].id if tail else 0
+        for e in reversed(tail):
+            self.buffer.append(self._message(e))
+            self.seen[e.id] = e.created_at
+        self.seeded = True
+
+    async def _tail(self):
+        # В Postgres id выдаются при INSERT, а видны после commit: событие с меньшим id может
+        # появиться позже большего. Поэтому кроме id > last перечитываем окно последних
+        # "late" секунд и отбрасываем уже разосланное.
+        late = timedelta(seconds=self.opts["late"])
+        since = timezone.now() - late
+        events = BoardEvent.objects.filter(Q(id__gt=self.last) | Q(created_at__gte=since)).order_by("id")
+        async for e in events:
+            if e.id in self.seen:
+                continue
+            self.seen[e.id] = e.created_at
+            if e.status == "RESET":
+                self.publish({"type": "snapshot", "seq": e.id, "board": await aboard_snapshot()})
+            else:
+                self.publish(self._message(e))
+            self.last = max(self.last, e.id)
+        self.seen = {i: at for i, at in self.seen.items() if at >= since - late}
+
+    async def _run(self):
+        waiter = (self._loop, asyncio.Event())
+        with desks._waiters_lock:
+            desks._waiters.add(waiter)
+        try:
+            while True:
+                waiter[1].clear()
+                try:
+                    if self.seeded:
+                        await self._tail()
+                    else:
+                        await self._seed()
+                except Exception:
+                    # БД недоступна: экраны подключаются и получают снимок, чтение повторим
+                    logger.exception("board hub: failed to read BoardEvent")
+                finally:
+                    self._ready.set()
+                try:
+                    await asyncio.wait_for(waiter[1].wait(), self.opts["poll"])
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            with desks._waiters_lock:
+                desks._waiters.discard(waiter)
+
+    @staticmethod
+    def _message(e):
+        if e.status == "RESET":
+            # из буфера снимок не восстановить — экрану придётся перечитать табло
+            return {"type": "reset", "seq": e.id}
+        return {
+            "type": "event",
+            "seq": e.id,
+            "desk": e.desk,
+            "ticket_id": e.ticket_id,
+            "number": e.number,
+            "status": e.status,
+            "at": iso_datetime(e.created_at),
+        }
+
+    def publish(self, message):
+        self.buffer.append(message)
+        for queue in list(self.clients):
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                # экран не успевает читать: отключаем, он переподключится с since
+                self.clients.discard(queue)
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(None)
+
+    def subscribe(self, since):
+        """
+        Очередь для нового экрана и то, что ему отправить сразу:
+        пропущенные события из буфера или None, если нужен снимок.
+        """
+        queue = asyncio.Queue(maxsize=self.opts["client_queue"])
+        self.clients.add(queue)
+        if since is None or not self.seeded or since > self.last:
+            return queue, None
+        missed = [m for m in self.buffer if m["seq"] > since]
+        if since < self.last and (not self.buffer or self.buffer[0]["seq"] > since + 1):
+            # часть пропущенного уже вытеснена из буфера
+            return queue, None
+        if any(m["type"] == "reset" for m in missed):
+            return queue, None
+        return queue, missed
+
+    def unsubscribe(self, queue):
+        self.clients.discard(queue)
+
+
+_hubs = weakref.WeakKeyDictionary()
+
+
+def get_hub():
+    """BoardHub текущего event loop (под uvicorn — один на процесс)."""
+    loop = asyncio.get_running_loop()
+    hub = _hubs.get(loop)
+    if hub is None:
+        hub = _hubs[loop] = BoardHub(loop)
+    return hub
+
+
+async def board_socket(scope, receive, send):
+    """ASGI-приложение для /ws/board/."""
+    message = await receive()
+    if message["type"] != "websocket.connect":
+        return
+    await send({"type": "websocket.accept"})
+
+    async def send_json(data):
+        await send({"type": "websocket.send", "text": json.dumps(data, ensure_ascii=False)})
+
+    try:
+        since = int(parse_qs(scope.get("query_string", b"").decode())["since"][0])
+    except (KeyError, ValueError):
+        since = None
+
+    hub = get_hub()
+    await hub.start()
+    # подписка и буфер — без await между ними, чтобы не потерять и не задвоить события
+    queue, missed = hub.subscribe(since)
+    seq = hub.last
+
+    async def wait_disconnect():
+        while (await receive())["type"] != "websocket.disconnect":
+            pass
+
+    disconnected = asyncio.ensure_future(wait_disconnect())
+    try:
+        if missed is None:
+            await send_json({"type": "snapshot", "seq": seq, "board": await aboard_snapshot()})
+        else:
+            for m in missed:
+                await send_json(m)
+
+        while True:
+            getter = asyncio.ensure_future(queue.get())
+            done, _ = await asyncio.wait({getter, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+            if getter not in done:
+                getter.cancel()
+                break
+            message = getter.result()
+            if message is None:
+                # 1013 Try Again Later: экран отстал, пусть переподключится с since
+                await send({"type": "websocket.close", "code": 1013})
+                break
+            await send_json(message)
+    finally:
+        hub.unsubscribe(queue)
+        disconnected.cancel()
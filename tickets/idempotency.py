@@ -0,0 +1,55 @@
+"""
+Idempotency-Key для выдачи талонов (POST /api/tickets/).
+
+Киоск на нестабильном Wi-Fi повторяет запрос с тем же ключом (static/assets/js/app.js);
+первый успешный ответ сохраняется в IdempotencyKey, повтор получает его же —
+без второго номера, маршрутизации и записи в очередь desk.
+Вместе с ключом хранится отпечаток проверенных данных запроса: тот же ключ с другими
+ФИО/телефоном/услугой — ошибка клиента (422), а не чужой талон с чужими данными.
+Ключи живут IDEMPOTENCY_KEYS["ttl"] секунд; просроченные удаляются при записи новых,
+так что таблица не больше, чем талонов за ttl.
+"""
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import IdempotencyKey
+
+
+HEADER = "Idempotency-Key"
+MAX_LENGTH = 64
+
+
+def _ttl():
+    return timedelta(seconds=getattr(settings, "IDEMPOTENCY_KEYS", {}).get("ttl", 24 * 3600))
+
+
+def fingerprint(data):
+    """sha256 данных запроса (validated_data сериализатора), не зависит от порядка полей."""
+    raw = json.dumps(data, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def lookup(key):
+    """(fingerprint, сохранённый ответ) для key или None (нет такого ключа / срок истёк)."""
+    return (
+        IdempotencyKey.objects
+        .filter(key=key, created_at__gte=timezone.now() - _ttl())
+        .values_list("fingerprint", "response")
+        .first()
+    )
+
+
+def remember(key, fingerprint, ticket_id, response):
+    """
+    Сохраняет ответ; вызывается в транзакции выдачи талона. Если тот же ключ уже записан
+    параллельным запросом — IntegrityError, и транзакция с талоном откатывается.
+    """
+    now = timezone.now()
+    IdempotencyKey.objects.filter(created_at__lt=now - _ttl()).delete()
+    IdempotencyKey.objects.create(
+        key=key, fingerprint=fingerprint, ticket_id=ticket_id, response=response, created_at=now,
+    )
@@ -0,0 +1,75 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from tickets.bench import scratch_database, seed_tickets, timed
+from tickets.desks import rebuild_counters
+from tickets.models import DeskQueue, Ticket
+
+
+DESK = 3
+
+
+def hot_queries():
+    """
+    Запросы с горячего пути в том виде, в каком их выполняют представления.
+    (название, queryset, как его выполняет view)
+    """
+    current = Ticket.objects.filter(desk=DESK, status="ACCEPTED").order_by("created_at")
+    pending = Ticket.objects.filter(desk=DESK, status="PENDING").order_by("created_at")
+    all_pending = Ticket.objects.filter(status="PENDING").order_by("created_at")
+    board = DeskQueue.objects.filter(current__isnull=False).values_list("desk", "current")
+
+    def claim():
+        with transaction.atomic():
+            Ticket.objects.select_for_update(skip_locked=True).filter(
+                desk=DESK, status="PENDING"
+            ).order_by("created_at").first()
+
+    return [
+        ("operator_dashboard / queue_json: current", current[:1], lambda: current.first()),
+        ("operator_dashboard / queue_json: pending", pending, lambda: list(pending.all())),
+        ("operator_call_next / next_for_desk: claim", pending[:1], claim),
+        ("TicketViewSet.pending (all desks)", all_pending, lambda: list(all_pending.all())),
+        ("TicketViewSet.board (DeskQueue snapshot)", board, lambda: list(board.all())),
+    ]
+
+
+class Command(BaseCommand):
+    help = "Seed a scratch DB with a large Ticket table and report EXPLAIN plans and timings of the hot queries"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--tickets", type=int, default=200_000, help="rows to seed (default 200000)")
+        parser.add_argument("--repeat", type=int, default=200, help="runs per query (default 200)")
+        parser.add_argument("--keepdb", action="store_true", help="reuse the scratch DB between runs")
+        parser.add_argument("--output", help="also write the report to this file")
+
+    def handle(self, *args, **options):
+        lines = []
+
+        def out(line=""):
+            lines.append(line)
+            self.stdout.write(line)
+
+        with scratch_database(keepdb=options["keepdb"]) as name:
+            if not Ticket.objects.exists():
+                seeded = seed_tickets(options["tickets"])
+                rebuild_counters()
+                self.stdout.write(self.style.SUCCESS(f"Seeded {seeded} tickets into {name}"))
+            with connection.cursor() as cursor:
+                if connection.vendor == "sqlite":
+                    cursor.execute("ANALYZE")
+                elif connection.vendor == "postgresql":
+                    cursor.execute("ANALYZE tickets_ticket")
+
+            out(f"# Ticket hot queries: {connection.vendor}, {Ticket.objects.count()} rows, {options['repeat']} runs each")
+            for title, qs, run in hot_queries():
+                median, p95 = timed(run, options["repeat"])
+                out("")
+                out(f"## {title}")
+                out(f"median {median:.3f} ms, p95 {p95:.3f} ms")
+                for plan_line in qs.explain().splitlines():
+                    out(f"    {plan_line}")
+
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+
+from tickets.api import TicketSerializer
+from tickets.bench import scratch_database, seed_tickets, timed
+from tickets.models import Ticket
+from tickets.projection import project, ticket_row, ticket_rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Micro-benchmark: per-row cost of TicketSerializer vs the .values() read projection "
+        "on the same PENDING rows (scratch DB)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=500, help="PENDING rows per run (default 500)")
+        parser.add_argument("--repeat", type=int, default=50, help="runs per variant (default 50)")
+        parser.add_argument("--keepdb", action="store_true", help="reuse the scratch DB between runs")
+
+    def handle(self, *args, **options):
+        rows, repeat = options["rows"], options["repeat"]
+
+        with scratch_database(keepdb=options["keepdb"]):
+            if not Ticket.objects.exists():
+                seed_tickets(rows * 2, pending_per_desk=rows // 25 + 1)
+
+            qs = Ticket.objects.filter(status="PENDING").order_by("created_at")[:rows]
+            n = len(qs.all())
+            one = qs.first()
+
+            variants = [
+                ("TicketSerializer(many=True)", lambda: TicketSerializer(qs.all(), many=True).data),
+                ("projection", lambda: ticket_rows(project(qs.all()))),
+                ("projection + labels", lambda: ticket_rows(project(qs.all()), "ru")),
+                ("TicketSerializer(ticket), 1 row", lambda: TicketSerializer(one).data),
+                ("ticket_row(ticket), 1 row", lambda: ticket_row(one)),
+            ]
+
+            self.stdout.write(f"{n} PENDING rows, {repeat} runs each (query + serialization)")
+            self.stdout.write(f"{'variant':<34} {'median ms':>10} {'p95 ms':>8} {'us/row':>8}")
+            for title, run in variants:
+                median, p95 = timed(run, repeat)
+                per_row = median * 1000 / (1 if "1 row" in title else max(n, 1))
+                self.stdout.write(f"{title:<34} {median:>10.3f} {p95:>8.3f} {per_row:>8.1f}")
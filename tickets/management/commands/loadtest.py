@@ -0,0 +1,215 @@
+import logging
+import random
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from config.models import FeatureFlag
+from operators.logbuffer import log_buffer
+from operators.models import OperatorProfile
+from tickets.bench import percentile, scratch_database
+from tickets.models import Ticket
+from tickets.routing import get_cfg
+from tickets.throttling import THROTTLE_FLAG
+
+
+KIOSK_PAYLOADS = [
+    {"service": "consultation", "category": "after11"},
+    {"service": "consultation", "category": "foreign"},
+    {"service": "consultation", "category": "after11", "track": "design"},
+    {"service": "admission", "category": "after11", "pay_type": "grant", "profile": "math_inf"},
+    {"service": "admission", "category": "afterCollege", "pay_type": "paid"},
+    {"service": "admission", "category": "master", "pay_type": "paid"},
+    {"service": "contest", "category": "after11", "profile": "creative"},
+    {"service": "contest", "category": "army"},
+]
+
+
+class Stats:
+    """Потокобезопасный сбор латентности, ошибок и числа SQL-запросов по endpoint."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latency = defaultdict(list)
+        self.errors = Counter()
+        self.queries = Counter()
+        self.claimed = Counter()
+        # endpoint -> Counter(HTTP-код)
+        self.statuses = defaultdict(Counter)
+
+    def record(self, endpoint, seconds, status, queries):
+        with self.lock:
+            self.latency[endpoint].append(seconds * 1000)
+            self.queries[endpoint] += queries
+            self.statuses[endpoint][status] += 1
+            if status >= 500:
+                self.errors[endpoint] += 1
+
+
+class Worker(threading.Thread):
+    def __init__(self, stats, stop, user=None, delay=0.0):
+        super().__init__(daemon=True)
+        self.stats = stats
+        self.stop = stop
+        self.delay = delay
+        self.client = Client(raise_request_exception=False)
+        if user is not None:
+            self.client.force_login(user)
+        self.rnd = random.Random()
+        self._queries = 0
+
+    def _count(self, execute, sql, params, many, context):
+        self._queries += 1
+        return execute(sql, params, many, context)
+
+    def call(self, endpoint, method, path, **kwargs):
+        self._queries = 0
+        t0 = time.perf_counter()
+        response = getattr(self.client, method)(path, **kwargs)
+        self.stats.record(endpoint, time.perf_counter() - t0, response.status_code, self._queries)
+        return response
+
+    def run(self):
+        # у каждого потока своё соединение с БД — считаем его запросы
+        with connection.execute_wrapper(self._count):
+            try:
+                while not self.stop.is_set():
+                    self.step()
+                    if self.delay:
+                        time.sleep(self.delay)
+            finally:
+                connection.close()
+
+
+class Kiosk(Worker):
+    def step(self):
+        n = self.rnd.randrange(10**7)
+        payload = {**self.rnd.choice(KIOSK_PAYLOADS), "fio": f"Load Test {n}", "phone": f"+7700{n:07d}"}
+        self.call("POST /api/tickets/", "post", "/api/tickets/", data=payload, content_type="application/json")
+
+
+class Operator(Worker):
+    AJAX = {"HTTP_X_REQUESTED_WITH": "XMLHttpRequest"}
+
+    def step(self):
+        r = self.call("operator_queue_json", "get", "/operator/queue.json", **self.AJAX)
+        current = r.json().get("current") if r.status_code == 200 else None
+
+        if current:
+            self.call(
+                "operator_set_status", "post",
+                f"/operator/ticket/{current['id']}/status/DONE/", **self.AJAX,
+            )
+            return
+
+        r = self.call("operator_call_next", "post", "/operator/call-next/", **self.AJAX)
+        if r.status_code == 200:
+            with self.stats.lock:
+                self.stats.claimed[r.json()["ticket"]] += 1
+
+
+class Command(BaseCommand):
+    help = (
+        "Load test: N simulated kiosks post tickets while M operators call/finish them, "
+        "in parallel threads against a scratch copy of the configured DB (SQLite or Postgres)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--kiosks", type=int, default=10)
+        parser.add_argument("--operators", type=int, default=10)
+        parser.add_argument("--duration", type=float, default=20.0, help="seconds (default 20)")
+        parser.add_argument("--kiosk-delay", type=float, default=0.0, help="pause between kiosk posts, seconds")
+        parser.add_argument("--operator-delay", type=float, default=0.0, help="pause between operator actions, seconds")
+        parser.add_argument("--keepdb", action="store_true", help="reuse the scratch DB between runs")
+        parser.add_argument(
+            "--throttle", action="store_true",
+            help="keep the ticket-create rate limiter on (all kiosks share one IP, most posts get 429)",
+        )
+
+    def handle(self, *args, **options):
+        # 404 "нет талонов" и 5xx считаем сами, трейсы django.request только мешают отчёту
+        request_logger = logging.getLogger("django.request")
+        level = request_logger.level
+        request_logger.setLevel(logging.CRITICAL)
+
+        setup_test_environment()
+        try:
+            with scratch_database(keepdb=options["keepdb"]) as name:
+                self.stdout.write(f"Scratch DB: {connection.vendor} {name}")
+                self.run_load(options)
+        finally:
+            teardown_test_environment()
+            request_logger.setLevel(level)
+
+    def operator_users(self, count):
+        """operator1..operatorM, по очереди на desk из config.json (как у живых операторов)."""
+        desks = sorted({d for group in (get_cfg().get("desks") or {}).values() for d in group}) or [1]
+        User = get_user_model()
+        users = []
+        for i in range(count):
+            user, _ = User.objects.get_or_create(username=f"loadtest_operator{i + 1}")
+            OperatorProfile.objects.update_or_create(user=user, defaults={"desk": desks[i % len(desks)]})
+            users.append(user)
+        return users
+
+    def run_load(self, options):
+        stats = Stats()
+        stop = threading.Event()
+        workers = [Kiosk(stats, stop, delay=options["kiosk_delay"]) for _ in range(options["kiosks"])]
+        workers += [
+            Operator(stats, stop, user=u, delay=options["operator_delay"])
+            for u in self.operator_users(options["operators"])
+        ]
+        # лимитер выдачи талонов меряем отдельно: здесь все киоски — один IP
+        FeatureFlag.objects.update_or_create(key=THROTTLE_FLAG, defaults={"enabled": options["throttle"]})
+        tickets_before = Ticket.objects.count()
+
+        started = time.perf_counter()
+        for w in workers:
+            w.start()
+        time.sleep(options["duration"])
+        stop.set()
+        for w in workers:
+            w.join()
+        elapsed = time.perf_counter() - started
+        # журнал операторов должен попасть в scratch-БД, а не в рабочую после её удаления
+        log_buffer.flush()
+
+        self.report(stats, elapsed, Ticket.objects.count() - tickets_before, options)
+
+    def report(self, stats, elapsed, created, options):
+        out = self.stdout.write
+        out("")
+        out(f"{options['kiosks']} kiosks, {options['operators']} operators, {elapsed:.1f} s")
+        out(f"{'endpoint':<24} {'requests':>8} {'errors':>6} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'q/req':>6}")
+        total_queries = 0
+        for endpoint in sorted(stats.latency):
+            samples = sorted(stats.latency[endpoint])
+            n = len(samples)
+            total_queries += stats.queries[endpoint]
+            out(
+                f"{endpoint:<24} {n:>8} {stats.errors[endpoint]:>6} {n / elapsed:>8.1f} "
+                f"{percentile(samples, 50):>8.1f} {percentile(samples, 95):>8.1f} {percentile(samples, 99):>8.1f} "
+                f"{stats.queries[endpoint] / max(n, 1):>6.1f}"
+            )
+
+        posts = stats.statuses["POST /api/tickets/"]
+        # выданным считаем только 201; 400 и 429 — отказы, а не пропускная способность
+        issued = posts[201]
+        rejected = sum(n for status, n in posts.items() if 400 <= status < 500)
+        double_claims = sum(1 for n in stats.claimed.values() if n > 1)
+        out("")
+        out(f"tickets created: {created} (201 responses: {issued}, {issued / elapsed:.1f}/s)")
+        out(f"rejected posts (4xx): {rejected}, of them rate-limited (429): {posts[429]}")
+        out(f"number collisions / failed creates: {stats.errors['POST /api/tickets/']}")
+        out(f"double claims: {double_claims}")
+        out(f"total DB queries: {total_queries}")
+
+        style = self.style.SUCCESS if not (double_claims or stats.errors) else self.style.WARNING
+        out(style("OK" if style == self.style.SUCCESS else "Errors or double claims detected"))
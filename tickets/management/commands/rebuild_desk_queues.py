@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from tickets.desks import rebuild_counters
+
+
+class Command(BaseCommand):
+    help = "Recalculate DeskQueue counters from the Ticket table"
+
+    def handle(self, *args, **options):
+        counts = rebuild_counters()
+        for desk, n in sorted(counts.items()):
+            self.stdout.write(f"desk {desk}: {n} pending")
+        self.stdout.write(self.style.SUCCESS(f"Done. desks with queue={len(counts)}"))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from tickets.archive import closed_before, rollover
+
+
+class Command(BaseCommand):
+    help = "Move DONE/CANCELLED tickets of past service days from Ticket into TicketArchive (run after closing the day)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--before", help="archive service days before this date, YYYY-MM-DD (default: today)")
+        parser.add_argument("--chunk-size", type=int, default=1000, help="tickets per transaction (default 1000)")
+        parser.add_argument("--dry-run", action="store_true", help="only count what would be moved")
+
+    def handle(self, *args, **options):
+        before = timezone.localdate()
+        if options["before"]:
+            before = parse_date(options["before"])
+            if before is None:
+                raise CommandError("--before must be YYYY-MM-DD")
+
+        if options["dry_run"]:
+            self.stdout.write(f"{closed_before(before).count()} tickets before {before} would be archived")
+            return
+
+        moved = rollover(before, chunk_size=max(options["chunk_size"], 1))
+        self.stdout.write(self.style.SUCCESS(f"Archived {moved} tickets before {before}"))
@@ -0,0 +1,149 @@
+"""
+Метрики в текстовом формате Prometheus (GET /metrics/, доступ — см. METRICS_TOKEN в settings).
+
+Счётчики и гистограммы обновляются на записи (создание и вызов талона, каждый запрос)
+и живут в памяти процесса — общего хранилища нет. Под "uvicorn --workers N" запрос
+/metrics/ попадает в случайный воркер, и Prometheus видит то один, то другой набор
+значений (ложные сбросы счётчиков, бессмысленная латентность). Поэтому atu_tickets_*,
+atu_ticket_wait_seconds и atu_request_duration_seconds верны только если каждый
+scrape target — один процесс: либо один воркер, либо воркеры на отдельных портах
+(по uvicorn на порт) и каждый порт отдельной целью в prometheus.yml.
+Глубина очередей по desk (atu_desk_*) берётся из DeskQueue, который и так ведётся
+на каждом переходе статуса, — она общая для всех процессов, и таблица Ticket
+при сборе метрик не сканируется.
+"""
+import threading
+import time
+from collections import defaultdict
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from .models import DeskQueue
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(pairs):
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+class Counter:
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help_text = help_text
+        self._values = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] += amount
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help_text}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield f"{self.name}{_labels(key)} {value:g}"
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [счётчики по корзинам..., sum, count]
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            row = self._values.setdefault(key, [0] * len(self.buckets) + [0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    row[i] += 1
+            row[-2] += value
+            row[-1] += 1
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help_text}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            items = sorted((key, list(row)) for key, row in self._values.items())
+        for key, row in items:
+            for bound, n in zip(self.buckets, row):
+                yield f"{self.name}_bucket{_labels(key + (('le', f'{bound:g}'),))} {n}"
+            yield f"{self.name}_bucket{_labels(key + (('le', '+Inf'),))} {row[-1]}"
+            yield f"{self.name}_sum{_labels(key)} {row[-2]:g}"
+            yield f"{self.name}_count{_labels(key)} {row[-1]}"
+
+
+TICKETS_CREATED = Counter("atu_tickets_created_total", "Tickets issued, by service")
+WAIT_SECONDS = Histogram(
+    "atu_ticket_wait_seconds",
+    "Time from ticket creation to being called (ACCEPTED), by desk",
+    buckets=(30, 60, 120, 300, 600, 900, 1200, 1800, 2700, 3600, 7200),
+)
+REQUEST_SECONDS = Histogram(
+    "atu_request_duration_seconds",
+    "Request latency by view and method",
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+
+
+def render_metrics():
+    lines = [
+        "# HELP atu_desk_pending Tickets waiting (PENDING) per desk",
+        "# TYPE atu_desk_pending gauge",
+    ]
+    desks = list(DeskQueue.objects.order_by("desk").values_list("desk", "pending", "accepted"))
+    lines += [f'atu_desk_pending{{desk="{desk}"}} {pending}' for desk, pending, _ in desks]
+    lines += [
+        "# HELP atu_desk_accepted Tickets being served (ACCEPTED) per desk",
+        "# TYPE atu_desk_accepted gauge",
+    ]
+    lines += [f'atu_desk_accepted{{desk="{desk}"}} {accepted}' for desk, _, accepted in desks]
+
+    for metric in (TICKETS_CREATED, WAIT_SECONDS, REQUEST_SECONDS):
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+class RequestMetricsMiddleware:
+    """
+    Латентность каждого запроса к именованному URL -> atu_request_duration_seconds{view, method}.
+    Работает и в sync, и в async цепочке (ASGI) без лишних переходов между потоками.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started = time.perf_counter()
+        response = self.get_response(request)
+        self.observe(request, started)
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        response = await self.get_response(request)
+        self.observe(request, started)
+        return response
+
+    @staticmethod
+    def observe(request, started):
+        match = getattr(request, "resolver_match", None)
+        if match is not None and match.url_name:
+            REQUEST_SECONDS.observe(time.perf_counter() - started, view=match.url_name, method=request.method)
@@ -0,0 +1,70 @@
+# Generated by Django 6.0.2 on 2026-10-18 09:19
+
+import re
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def fill_service_day_and_sequences(apps, schema_editor):
+    """
+    Проставляем service_day по created_at и заводим счётчики на каждый
+    (префикс, день), чтобы новые номера продолжали уже выданные.
+    """
+    Ticket = apps.get_model("tickets", "Ticket")
+    TicketSequence = apps.get_model("tickets", "TicketSequence")
+
+    last = {}
+    for t in Ticket.objects.only("id", "number", "created_at").iterator():
+        day = timezone.localdate(t.created_at) if t.created_at else timezone.localdate()
+        Ticket.objects.filter(id=t.id).update(service_day=day)
+
+        m = re.match(r"^([A-Z]+)-(\d+)$", t.number or "")
+        if not m:
+            continue
+        key = (m.group(1), day.isoformat())
+        last[key] = max(last.get(key, 0), int(m.group(2)))
+
+    TicketSequence.objects.bulk_create([
+        TicketSequence(prefix=prefix, period=period, value=value)
+        for (prefix, period), value in last.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0002_alter_ticket_number'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TicketSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('prefix', models.CharField(max_length=4)),
+                ('period', models.CharField(max_length=32)),
+                ('value', models.PositiveIntegerField(default=100)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='service_day',
+            field=models.DateField(default=django.utils.timezone.localdate, editable=False),
+        ),
+        migrations.RunPython(fill_service_day_and_sequences, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='ticket',
+            name='number',
+            field=models.CharField(blank=True, max_length=20),
+        ),
+        migrations.AddConstraint(
+            model_name='ticket',
+            constraint=models.UniqueConstraint(fields=('service_day', 'number'), name='uniq_ticket_number_per_day'),
+        ),
+        migrations.AddConstraint(
+            model_name='ticketsequence',
+            constraint=models.UniqueConstraint(fields=('prefix', 'period'), name='uniq_ticket_sequence'),
+        ),
+    ]
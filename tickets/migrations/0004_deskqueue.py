@@ -0,0 +1,36 @@
+# Generated by Django 6.0.2 on 2026-10-18 09:20
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def seed_desk_queues(apps, schema_editor):
+    Ticket = apps.get_model("tickets", "Ticket")
+    DeskQueue = apps.get_model("tickets", "DeskQueue")
+
+    counts = (
+        Ticket.objects
+        .filter(status="PENDING", desk__isnull=False)
+        .values_list("desk")
+        .annotate(n=Count("id"))
+    )
+    DeskQueue.objects.bulk_create([DeskQueue(desk=desk, pending=n) for desk, n in counts])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0003_ticket_sequence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeskQueue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('desk', models.IntegerField(unique=True)),
+                ('pending', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(seed_desk_queues, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-18 09:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0005_ticket_hot_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='deskqueue',
+            name='version',
+            field=models.BigIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 6.0.2 on 2026-10-18 09:23
+
+import datetime
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def _json_value(value):
+    if isinstance(value, datetime.datetime):
+        value = timezone.localtime(value).isoformat()
+        return value[:-6] + "Z" if value.endswith("+00:00") else value
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    return value
+
+
+def seed_board(apps, schema_editor):
+    Ticket = apps.get_model("tickets", "Ticket")
+    DeskQueue = apps.get_model("tickets", "DeskQueue")
+
+    current = {}
+    for t in Ticket.objects.filter(status="ACCEPTED", desk__isnull=False).order_by("created_at"):
+        current[t.desk] = {f.name: _json_value(getattr(t, f.attname)) for f in t._meta.concrete_fields}
+
+    for desk, entry in current.items():
+        DeskQueue.objects.update_or_create(desk=desk, defaults={"current": entry})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0006_deskqueue_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='deskqueue',
+            name='current',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.RunPython(seed_board, migrations.RunPython.noop),
+    ]
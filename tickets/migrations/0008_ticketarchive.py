@@ -0,0 +1,40 @@
+# Generated by Django 6.0.2 on 2026-10-18 09:32
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0007_deskqueue_current'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TicketArchive',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('number', models.CharField(blank=True, max_length=20)),
+                ('service', models.CharField(choices=[('consultation', 'Consultation'), ('admission', 'Admission'), ('contest', 'Grant Contest'), ('online', 'Online Admission')], max_length=20)),
+                ('category', models.CharField(blank=True, default='', max_length=50)),
+                ('pay_type', models.CharField(blank=True, default='', max_length=20)),
+                ('profile', models.CharField(blank=True, default='', max_length=50)),
+                ('track', models.CharField(blank=True, default='', max_length=20)),
+                ('desk', models.IntegerField(blank=True, null=True)),
+                ('fio', models.CharField(max_length=200)),
+                ('phone', models.CharField(max_length=30)),
+                ('social_category', models.CharField(blank=True, default='', max_length=50)),
+                ('is_online', models.BooleanField(default=False)),
+                ('meeting_type', models.CharField(blank=True, default='', max_length=20)),
+                ('whatsapp', models.CharField(blank=True, default='', max_length=30)),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('ACCEPTED', 'Accepted'), ('DONE', 'Done'), ('CANCELLED', 'Cancelled')], max_length=20)),
+                ('created_at', models.DateTimeField()),
+                ('service_day', models.DateField()),
+                ('archived_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['created_at', 'id'], name='archive_created_idx'), models.Index(fields=['service_day', 'number'], name='archive_day_number_idx'), models.Index(fields=['desk', 'created_at'], name='archive_desk_created_idx')],
+            },
+        ),
+    ]
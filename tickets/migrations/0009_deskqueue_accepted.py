@@ -0,0 +1,34 @@
+# Generated by Django 6.0.2 on 2026-10-18 09:45
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def seed_accepted(apps, schema_editor):
+    Ticket = apps.get_model("tickets", "Ticket")
+    DeskQueue = apps.get_model("tickets", "DeskQueue")
+
+    counts = (
+        Ticket.objects
+        .filter(status="ACCEPTED", desk__isnull=False)
+        .values_list("desk")
+        .annotate(n=Count("id"))
+    )
+    for desk, n in counts:
+        DeskQueue.objects.update_or_create(desk=desk, defaults={"accepted": n})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0008_ticketarchive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='deskqueue',
+            name='accepted',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(seed_accepted, migrations.RunPython.noop),
+    ]
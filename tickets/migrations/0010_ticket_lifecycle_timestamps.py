@@ -0,0 +1,46 @@
+# Generated by Django 6.0.2 on 2026-10-18 09:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0009_deskqueue_accepted'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ticket',
+            name='accepted_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='done_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='ticketarchive',
+            name='accepted_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='ticketarchive',
+            name='done_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='ServiceTimeEstimate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('desk', models.IntegerField()),
+                ('service', models.CharField(max_length=20)),
+                ('avg_seconds', models.FloatField()),
+                ('samples', models.PositiveIntegerField(default=1)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('desk', 'service'), name='uniq_service_time_desk_service')],
+            },
+        ),
+    ]
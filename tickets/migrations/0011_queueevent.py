@@ -0,0 +1,28 @@
+# Generated by Django 6.0.2 on 2026-10-18 10:05
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0010_ticket_lifecycle_timestamps'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QueueEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('desk', models.IntegerField()),
+                ('version', models.BigIntegerField()),
+                ('ticket_id', models.IntegerField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['created_at'], name='queue_event_created_idx')],
+                'constraints': [models.UniqueConstraint(fields=('desk', 'version'), name='uniq_queue_event_version')],
+            },
+        ),
+    ]
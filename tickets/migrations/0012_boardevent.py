@@ -0,0 +1,28 @@
+# Generated by Django 6.0.2 on 2026-10-18 10:30
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0011_queueevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BoardEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('desk', models.IntegerField(blank=True, null=True)),
+                ('ticket_id', models.IntegerField(blank=True, null=True)),
+                ('number', models.CharField(blank=True, max_length=20)),
+                ('status', models.CharField(max_length=20)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['created_at'], name='board_event_created_idx')],
+            },
+        ),
+    ]
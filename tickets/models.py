@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 
 class Ticket(models.Model):
     SERVICE_CHOICES = [
@@ -15,7 +16,7 @@ class Ticket(models.Model):
         ("CANCELLED", "Cancelled"),
     ]
 
-    number = models.CharField(max_length=20, unique=True, blank=True)  # ✅ blank=True
+    number = models.CharField(max_length=20, blank=True)  # ✅ blank=True, уникален в пределах service_day
     service = models.CharField(max_length=20, choices=SERVICE_CHOICES)
     category = models.CharField(max_length=50, blank=True, default="")
     pay_type = models.CharField(max_length=20, blank=True, default="")
@@ -34,6 +35,205 @@ class Ticket(models.Model):
 
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="PENDING")
     created_at = models.DateTimeField(auto_now_add=True)
+    service_day = models.DateField(default=timezone.localdate, editable=False)
+    # проставляются в tickets.desks.set_status (и массовых операциях)
+    accepted_at = models.DateTimeField(null=True, blank=True)
+    done_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["service_day", "number"], name="uniq_ticket_number_per_day"),
+        ]
+        indexes = [
+            # /pending/ без desk, /board/, списки по статусу: WHERE status=? ORDER BY created_at
+            models.Index(fields=["status", "created_at"], name="ticket_status_created_idx"),
+            # очередь desk / текущий талон desk: WHERE desk=? AND status=? ORDER BY created_at.
+            # Частичные индексы только по живым строкам: остаются маленькими, сколько бы
+            # DONE/CANCELLED ни накопилось, и смена статуса трогает не больше двух из них.
+            # Полный (desk, status, created_at) только дублировал бы их и обновлялся на каждом переходе.
+            models.Index(
+                fields=["desk", "created_at"],
+                condition=models.Q(status="PENDING"),
+                name="ticket_pending_idx",
+            ),
+            models.Index(
+                fields=["desk", "created_at"],
+                condition=models.Q(status="ACCEPTED"),
+                name="ticket_accepted_idx",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.number} ({self.service})"
+
+
+class TicketSequence(models.Model):
+    """
+    Счётчик номеров талонов: одна строка на префикс и период.
+    period — дата (сброс каждый день) или ключ сессии приёма (см. TICKET_NUMBER_RESET).
+    """
+    prefix = models.CharField(max_length=4)
+    period = models.CharField(max_length=32)
+    value = models.PositiveIntegerField(default=100)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["prefix", "period"], name="uniq_ticket_sequence"),
+        ]
+
+    def __str__(self):
+        return f"{self.prefix} [{self.period}] = {self.value}"
+
+
+class DeskQueue(models.Model):
+    """
+    Живое состояние очереди desk, которое обновляется на каждом переходе статуса
+    (см. tickets.desks), чтобы не считать COUNT(*) по Ticket на горячем пути.
+    """
+    desk = models.IntegerField(unique=True)
+    pending = models.IntegerField(default=0)
+    accepted = models.IntegerField(default=0)
+    # растёт при любом изменении очереди или текущего талона desk
+    version = models.BigIntegerField(default=0)
+    # текущий вызванный (ACCEPTED) талон в формате /api/tickets/board/, NULL — никого
+    current = models.JSONField(null=True, blank=True)
+
+    def __str__(self):
+        return f"desk {self.desk}: {self.pending} pending"
+
+
+class QueueEvent(models.Model):
+    """
+    Журнал изменений очереди desk: одна строка на каждое увеличение DeskQueue.version.
+    По нему /operator/queue.json?v=N отдаёт только талоны, изменившиеся после версии N.
+    ticket_id = NULL — массовое изменение, клиенту нужен полный список.
+    """
+    desk = models.IntegerField()
+    version = models.BigIntegerField()
+    ticket_id = models.IntegerField(null=True, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["desk", "version"], name="uniq_queue_event_version"),
+        ]
+        indexes = [
+            models.Index(fields=["created_at"], name="queue_event_created_idx"),
+        ]
+
+    def __str__(self):
+        return f"desk {self.desk} v{self.version}: {self.ticket_id or 'reset'}"
+
+
+class BoardEvent(models.Model):
+    """
+    Событие табло: талон вызван (ACCEPTED), завершён (DONE) или отменён (CANCELLED).
+    id — сквозной номер события; по нему экраны в зале догоняют пропущенное
+    после переподключения к /ws/board/ (см. tickets.hub). RESET — табло пересобрано целиком.
+    """
+    desk = models.IntegerField(null=True, blank=True)
+    ticket_id = models.IntegerField(null=True, blank=True)
+    number = models.CharField(max_length=20, blank=True)
+    status = models.CharField(max_length=20)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["created_at"], name="board_event_created_idx"),
+        ]
+
+    def __str__(self):
+        return f"#{self.id} desk {self.desk}: {self.number} {self.status}"
+
+
+class TicketArchive(models.Model):
+    """
+    Закрытые (DONE/CANCELLED) талоны прошлых дней — переносятся из Ticket
+    командой rollover_tickets, чтобы горячая таблица держала только живой день.
+    id сохраняется прежним; поля те же, что у Ticket.
+    """
+    id = models.IntegerField(primary_key=True)
+    number = models.CharField(max_length=20, blank=True)
+    service = models.CharField(max_length=20, choices=Ticket.SERVICE_CHOICES)
+    category = models.CharField(max_length=50, blank=True, default="")
+    pay_type = models.CharField(max_length=20, blank=True, default="")
+    profile = models.CharField(max_length=50, blank=True, default="")
+    track = models.CharField(max_length=20, blank=True, default="")
+    desk = models.IntegerField(null=True, blank=True)
+
+    fio = models.CharField(max_length=200)
+    phone = models.CharField(max_length=30)
+
+    social_category = models.CharField(max_length=50, blank=True, default="")
+
+    is_online = models.BooleanField(default=False)
+    meeting_type = models.CharField(max_length=20, blank=True, default="")
+    whatsapp = models.CharField(max_length=30, blank=True, default="")
+
+    status = models.CharField(max_length=20, choices=Ticket.STATUS_CHOICES)
+    created_at = models.DateTimeField()
+    service_day = models.DateField()
+    accepted_at = models.DateTimeField(null=True, blank=True)
+    done_at = models.DateTimeField(null=True, blank=True)
+
+    archived_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            # /api/tickets/archive/: keyset по (created_at, id) + фильтры
+            models.Index(fields=["created_at", "id"], name="archive_created_idx"),
+            models.Index(fields=["service_day", "number"], name="archive_day_number_idx"),
+            models.Index(fields=["desk", "created_at"], name="archive_desk_created_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.number} ({self.service_day})"
+
+
+class ServiceTimeEstimate(models.Model):
+    """
+    Скользящее (EWMA) время обслуживания одного заявителя на desk по услуге,
+    обновляется одним UPDATE на каждый DONE (см. tickets.desks.record_service_time).
+    """
+    desk = models.IntegerField()
+    service = models.CharField(max_length=20)
+    avg_seconds = models.FloatField()
+    samples = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["desk", "service"], name="uniq_service_time_desk_service"),
+        ]
+
+    def __str__(self):
+        return f"desk {self.desk} / {self.service}: {self.avg_seconds:.0f}s ({self.samples})"
+
+
+class IdempotencyKey(models.Model):
+    """
+    Idempotency-Key запроса POST /api/tickets/ и ответ на него (см. tickets.idempotency):
+    повтор с тем же ключом получает тот же талон без новой нумерации и маршрутизации.
+    Хранится IDEMPOTENCY_KEYS["ttl"] секунд.
+    """
+    key = models.CharField(max_length=64, unique=True)
+    # sha256 проверенных данных запроса: тот же ключ с другим телом — не повтор
+    fingerprint = models.CharField(max_length=64)
+    ticket_id = models.IntegerField()
+    response = models.JSONField()
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self):
+        return f"{self.key} -> #{self.ticket_id}"
+
+
+class RateBucket(models.Model):
+    """
+    Token bucket ограничителя выдачи талонов в общем (DB) режиме — одна строка на ключ
+    ("ip:...", "phone:..."), общая для всех процессов (см. tickets.throttling).
+    """
+    key = models.CharField(max_length=80, unique=True)
+    tokens = models.FloatField()
+    updated_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self):
+        return f"{self.key}: {self.tokens:.2f}"
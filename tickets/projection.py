@@ -0,0 +1,125 @@
+"""
+Лёгкая read-проекция талонов для горячих JSON-эндпоинтов
+(pending, list, next, board, operator queue.json).
+
+Строки берутся через .values() и собираются в dict напрямую — без экземпляров
+модели и без полей DRF. Формат совпадает с TicketSerializer (fields="__all__"),
+плюс необязательные подписи *_label на выбранном языке.
+"""
+from django.utils import timezone
+
+from .models import Ticket
+
+
+# -------------------------
+# RU/KZ labels
+# -------------------------
+SERVICE_LABELS = {
+    "ru": {
+        "consultation": "Консультация",
+        "admission": "Поступление",
+        "contest": "Грант конкурс",
+        "online": "Онлайн поступление",
+    },
+    "kz": {
+        "consultation": "Кеңес алу",
+        "admission": "Оқуға түсу",
+        "contest": "Грант конкурсы",
+        "online": "Онлайн өтініш",
+    }
+}
+
+CATEGORY_LABELS = {
+    "ru": {
+        "after11": "После 11 класса",
+        "afterCollege": "После колледжа",
+        "foreign": "Иностранец",
+        "master": "Магистратура/Докторантура",
+        "masters": "Магистратура/Докторантура",
+        "army": "Военный",
+    },
+    "kz": {
+        "after11": "11 сыныптан кейін",
+        "afterCollege": "Колледжден кейін",
+        "foreign": "Шетел азаматы",
+        "master": "Магистратура/Докторантура",
+        "masters": "Магистратура/Докторантура",
+        "army": "Әскер",
+    }
+}
+
+STATUS_LABELS = {
+    "ru": {
+        "PENDING": "Ожидает",
+        "ACCEPTED": "Вызван",
+        "DONE": "Завершён",
+        "CANCELLED": "Отменён"
+    },
+    "kz": {
+        "PENDING": "Күтуде",
+        "ACCEPTED": "Шақырылды",
+        "DONE": "Аяқталды",
+        "CANCELLED": "Бас тартылды"
+    },
+}
+
+
+def t_service(service, lang):
+    return SERVICE_LABELS.get(lang, {}).get(service, service or "")
+
+
+def t_category(cat, lang):
+    return CATEGORY_LABELS.get(lang, {}).get(cat, cat or "")
+
+
+def t_status(st, lang):
+    return STATUS_LABELS.get(lang, {}).get(st, st or "")
+
+
+# -------------------------
+# Projection
+# -------------------------
+# те же поля и в том же порядке, что у TicketSerializer(fields="__all__")
+FIELDS = tuple(f.attname for f in Ticket._meta.concrete_fields)
+
+
+def iso_datetime(value):
+    # как rest_framework.fields.DateTimeField: в текущей TZ, UTC -> "Z"
+    if value is None:
+        return None
+    if timezone.is_aware(value):
+        value = timezone.localtime(value)
+    value = value.isoformat()
+    if value.endswith("+00:00"):
+        value = value[:-6] + "Z"
+    return value
+
+
+DATETIME_FIELDS = ("created_at", "accepted_at", "done_at")
+
+
+def _finish(row, lang):
+    for name in DATETIME_FIELDS:
+        row[name] = iso_datetime(row[name])
+    day = row["service_day"]
+    row["service_day"] = day.isoformat() if day else None
+    if lang:
+        row["service_label"] = t_service(row["service"], lang)
+        row["category_label"] = t_category(row["category"], lang)
+        row["status_label"] = t_status(row["status"], lang)
+    return row
+
+
+def project(qs):
+    """queryset талонов -> .values() с полями проекции (можно дальше фильтровать/резать)."""
+    return qs.values(*FIELDS)
+
+
+def ticket_rows(rows, lang=None):
+    """Строки из project(qs) -> список dict для JSON. lang="ru"/"kz" добавляет *_label."""
+    return [_finish(row, lang) for row in rows]
+
+
+def ticket_row(ticket, lang=None):
+    """То же для уже загруженного экземпляра Ticket (next/done/cancel, табло)."""
+    return _finish({f: getattr(ticket, f) for f in FIELDS}, lang)
@@ -0,0 +1,155 @@
+import json
+import os
+import threading
+import time
+from itertools import product
+from pathlib import Path
+
+from django.conf import settings
+
+from .desks import least_loaded
+
+
+# (service, category, track, profile) -> группа desk из config.json["desks"].
+# "*" — любое значение; срабатывает первое совпавшее правило, None — без desk.
+ROUTE_RULES = [
+    ("online", "*", "*", "*", None),
+
+    ("consultation", "*", "design", "*", "design"),
+    ("consultation", "foreign", "*", "*", "foreign"),
+    ("consultation", "master", "*", "*", "master"),
+    ("consultation", "army", "*", "*", "army"),
+
+    ("admission", "*", "*", "creative", "design"),
+    ("admission", "foreign", "*", "*", "foreign"),
+    ("admission", "master", "*", "*", "master"),
+    ("admission", "army", "*", "*", "army"),
+
+    ("contest", "*", "*", "creative", "design"),
+    ("contest", "foreign", "*", "*", "foreign"),
+    ("contest", "master", "*", "*", "master"),
+    ("contest", "army", "*", "*", "army"),
+
+    ("*", "*", "*", "*", "default"),
+]
+
+ANY = "*"
+
+
+def config_path():
+    return Path(settings.BASE_DIR) / "static" / "config" / "config.json"
+
+
+def load_cfg():
+    p = config_path()
+    if p.exists():
+        return json.loads(p.read_text(encoding="utf-8"))
+    return {}
+
+
+def _known_values():
+    """Значения, которые реально различают правила, по каждому измерению ключа."""
+    dims = [set(), set(), set(), set()]
+    for rule in ROUTE_RULES:
+        for i, v in enumerate(rule[:4]):
+            if v != ANY:
+                dims[i].add(v)
+    return [tuple(sorted(d)) + (ANY,) for d in dims]
+
+
+KNOWN = _known_values()
+
+
+def _match(rule, key):
+    return all(r == ANY or r == k for r, k in zip(rule[:4], key))
+
+
+def compile_routes(cfg):
+    """
+    Разворачивает ROUTE_RULES в таблицу {(service, category, track, profile): (desk, ...)}
+    по всем известным значениям. Неизвестные значения при поиске сводятся к "*".
+    """
+    desks = (cfg or {}).get("desks", {}) or {}
+    table = {}
+    for key in product(*KNOWN):
+        group = next((rule[4] for rule in ROUTE_RULES if _match(rule, key)), None)
+        table[key] = tuple(desks.get(group, []) or []) if group else ()
+    return table
+
+
+def route_key(ticket_data):
+    raw = (
+        ticket_data.get("service") or "",
+        ticket_data.get("category") or "",
+        ticket_data.get("track") or "",
+        ticket_data.get("profile") or "",
+    )
+    return tuple(v if v in known else ANY for v, known in zip(raw, KNOWN))
+
+
+# -------------------------
+# Cache (per process)
+# -------------------------
+_lock = threading.Lock()
+_state = {"mtime": None, "checked": 0.0, "cfg": {}, "table": compile_routes({})}
+
+
+def _refresh(force=False):
+    """
+    Перечитывает config.json только если изменился mtime файла.
+    Сам mtime проверяется не чаще раза в ROUTING_CONFIG_RECHECK секунд,
+    так что на пути создания талона обычно нет обращения к диску.
+    """
+    now = time.monotonic()
+    recheck = getattr(settings, "ROUTING_CONFIG_RECHECK", 5)
+    if not force and _state["mtime"] is not None and now - _state["checked"] < recheck:
+        return
+
+    with _lock:
+        if not force and _state["mtime"] is not None and now - _state["checked"] < recheck:
+            return
+        try:
+            mtime = os.stat(config_path()).st_mtime_ns
+        except OSError:
+            mtime = 0
+
+        if force or mtime != _state["mtime"]:
+            cfg = load_cfg() if mtime else {}
+            _state["cfg"] = cfg
+            _state["table"] = compile_routes(cfg)
+            _state["mtime"] = mtime
+        _state["checked"] = now
+
+
+def get_cfg():
+    _refresh()
+    return _state["cfg"]
+
+
+def reload_cfg():
+    _refresh(force=True)
+    return _state["cfg"]
+
+
+def desks_for(ticket_data):
+    """Все desk группы, в которую попадает талон (пустой кортеж — без desk)."""
+    _refresh()
+    return _state["table"].get(route_key(ticket_data), ())
+
+
+def route_desk(ticket_data):
+    """desk с самой короткой живой очередью в группе талона."""
+    return least_loaded(desks_for(ticket_data))
+
+
+def desk_group(desk):
+    """Остальные desk той же группы config.json["desks"], что и desk (по порядку в конфиге)."""
+    for group in (get_cfg().get("desks") or {}).values():
+        if desk in (group or []):
+            return tuple(d for d in group if d != desk)
+    return ()
+
+
+def configured_desks():
+    """Все desk из config.json["desks"]."""
+    return {d for group in (get_cfg().get("desks") or {}).values() for d in (group or [])}
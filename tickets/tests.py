@@ -1,3 +1,735 @@
-from django.test import TestCase
+import asyncio
+import json
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.test import AsyncClient, SimpleTestCase, TransactionTestCase, override_settings
+from rest_framework.test import APIClient
+
+from atu_queue.asgi import application
+from operators.logbuffer import log_buffer
+from . import hub, throttling
+from .models import BoardEvent, Ticket
+
+
+def create_ticket(phone="87010000001", headers=None, **extra):
+    payload = {"service": "consultation", "category": "army", "fio": "Тест", "phone": phone, **extra}
+    return APIClient().post("/api/tickets/", payload, format="json", **(headers or {}))
+
+
+class BoardSocket:
+    """Экран табло: ASGI-соединение /ws/board/ без сервера."""
+
+    def __init__(self, query=b""):
+        self.query = query
+        self.inbox = asyncio.Queue()
+        self.sent = []
+
+    async def send(self, message):
+        self.sent.append(message)
+
+    @property
+    def messages(self):
+        return [json.loads(m["text"]) for m in self.sent if m["type"] == "websocket.send"]
+
+    async def open(self):
+        await self.inbox.put({"type": "websocket.connect"})
+        scope = {"type": "websocket", "path": "/ws/board/", "query_string": self.query}
+        self.task = asyncio.ensure_future(application(scope, self.inbox.get, self.send))
+
+    async def receive(self, count, timeout=3):
+        async def wait():
+            while len(self.messages) < count:
+                await asyncio.sleep(0.01)
+        await asyncio.wait_for(wait(), timeout)
+        return self.messages
+
+    async def close(self):
+        await self.inbox.put({"type": "websocket.disconnect"})
+        await self.task
+
+
+@override_settings(BOARD_HUB={"poll": 10})
+class BoardHubTests(TransactionTestCase):
+    def setUp(self):
+        throttling.memory_buckets._buckets.clear()
+        self.ticket = create_ticket().json()
+
+    def call_and_finish(self):
+        client = APIClient()
+        client.post("/api/tickets/next/", {"desk": self.ticket["desk"]}, format="json")
+        client.post(f"/api/tickets/{self.ticket['id']}/done/", format="json")
+
+    def test_events_reach_every_screen(self):
+        async def scenario():
+            screens = [BoardSocket(), BoardSocket()]
+            for screen in screens:
+                await screen.open()
+                await screen.receive(1)
+            await sync_to_async(self.call_and_finish)()
+            result = [await screen.receive(3) for screen in screens]
+            for screen in screens:
+                await screen.close()
+            return result
+
+        first, second = asyncio.run(scenario())
+        self.assertEqual(first[0]["type"], "snapshot")
+        self.assertEqual([m["status"] for m in first[1:]], ["ACCEPTED", "DONE"])
+        self.assertEqual(first, second)
+
+    def test_reconnect_replays_missed_events(self):
+        self.call_and_finish()
+        accepted, done = BoardEvent.objects.order_by("id")
+
+        async def scenario():
+            screen = BoardSocket(f"since={accepted.id}".encode())
+            await screen.open()
+            messages = await screen.receive(1)
+            await screen.close()
+            return messages
+
+        messages = asyncio.run(scenario())
+        self.assertEqual(len(messages), 1)
+        self.assertEqual((messages[0]["seq"], messages[0]["status"]), (done.id, "DONE"))
+
+    def test_unknown_since_gets_snapshot(self):
+        self.call_and_finish()
+        BoardEvent.objects.create(status="RESET")
+
+        async def scenario():
+            screen = BoardSocket(b"since=0")
+            await screen.open()
+            messages = await screen.receive(1)
+            await screen.close()
+            return messages
+
+        (message,) = asyncio.run(scenario())
+        self.assertEqual(message["type"], "snapshot")
+
+    def test_late_commit_is_not_skipped(self):
+        # событие с меньшим id стало видно позже большего (commit не по порядку в Postgres)
+        self.call_and_finish()
+        early, late = BoardEvent.objects.order_by("id")
+        early_row = {f.attname: getattr(early, f.attname) for f in BoardEvent._meta.concrete_fields}
+        early.delete()
+
+        async def scenario():
+            board = hub.get_hub()
+            await board.start()
+            seen_before = board.last
+            await sync_to_async(BoardEvent.objects.create)(**early_row)
+            await board._tail()
+            return seen_before, list(board.buffer)
+
+        seen_before, buffer = asyncio.run(scenario())
+        self.assertEqual(seen_before, late.id)
+        self.assertEqual(buffer[-1]["seq"], early_row["id"])
+
+    def test_hub_starts_when_database_fails(self):
+        async def scenario():
+            board = hub.get_hub()
+
+            async def broken():
+                raise RuntimeError("db is down")
+            board._seed = broken
+            await asyncio.wait_for(board.start(), 3)
+            return board.subscribe(None)
+
+        with self.assertLogs("tickets.hub", "ERROR"):
+            _, missed = asyncio.run(scenario())
+        self.assertIsNone(missed)
+        self.assertEqual(Ticket.objects.count(), 1)
+
+
+@override_settings(BOARD_HUB={"buffer": 3})
+class HubSubscribeTests(SimpleTestCase):
+    """Что получает переподключившийся экран: пропущенное из буфера или None (снимок)."""
+
+    def hub(self, *messages):
+        board = hub.BoardHub(loop=None)
+        board.buffer.extend(messages)
+        board.last = messages[-1]["seq"] if messages else 0
+        board.seeded = True
+        return board
+
+    @staticmethod
+    def event(seq):
+        return {"type": "event", "seq": seq, "status": "ACCEPTED"}
+
+    def missed(self, board, since):
+        _, missed = board.subscribe(since)
+        return None if missed is None else [m["seq"] for m in missed]
+
+    def test_replays_only_missed(self):
+        board = self.hub(self.event(5), self.event(6), self.event(7))
+        self.assertEqual(self.missed(board, 5), [6, 7])
+        self.assertEqual(self.missed(board, 7), [])
+        self.assertEqual(len(board.clients), 2)
+
+    def test_snapshot_cases(self):
+        board = self.hub(self.event(5), self.event(6), self.event(7))
+        # первое подключение и since из будущего (журнал очищен, процесс перезапущен)
+        self.assertIsNone(self.missed(board, None))
+        self.assertIsNone(self.missed(board, 8))
+        # события 3 и 4 уже вытеснены из буфера
+        self.assertIsNone(self.missed(board, 2))
+        self.assertEqual(self.missed(board, 4), [5, 6, 7])
+
+    def test_reset_in_missed_needs_snapshot(self):
+        board = self.hub(self.event(5), {"type": "reset", "seq": 6}, self.event(7))
+        self.assertIsNone(self.missed(board, 5))
+        self.assertEqual(self.missed(board, 6), [7])
+
+    def test_not_seeded_gets_snapshot(self):
+        board = self.hub(self.event(5))
+        board.seeded = False
+        self.assertIsNone(self.missed(board, 4))
+        # пустой журнал: экрану с since=0 досылать нечего
+        self.assertEqual(self.missed(self.hub(), 0), [])
+
+
+class MetricsEndpointTests(TransactionTestCase):
+    def test_local_scrape_only_without_token(self):
+        self.assertEqual(self.client.get("/metrics/").status_code, 200)
+        # через обратный прокси REMOTE_ADDR тоже 127.0.0.1
+        self.assertEqual(self.client.get("/metrics/", HTTP_X_FORWARDED_FOR="203.0.113.5").status_code, 404)
+
+    @override_settings(METRICS_TOKEN="secret")
+    def test_token_required_when_configured(self):
+        self.assertEqual(self.client.get("/metrics/").status_code, 404)
+        self.assertEqual(self.client.get("/metrics/", HTTP_AUTHORIZATION="Bearer wrong").status_code, 404)
+        self.assertEqual(self.client.get("/metrics/", HTTP_AUTHORIZATION="Bearer secret").status_code, 200)
+
+
+class TicketNumberTests(TransactionTestCase):
+    def setUp(self):
+        throttling.memory_buckets._buckets.clear()
+
+    def test_daily_numbers_are_sequential(self):
+        numbers = [create_ticket(phone=f"8701000000{i}").json()["number"] for i in range(3)]
+        self.assertEqual(numbers, ["C-101", "C-102", "C-103"])
+
+    def test_session_switch_mid_day_continues_after_issued_numbers(self):
+        self.assertEqual(create_ticket(phone="87010000001").json()["number"], "C-101")
+        with override_settings(TICKET_NUMBER_RESET="session", TICKET_NUMBER_SESSION="2026-summer"):
+            self.assertEqual(create_ticket(phone="87010000002").json()["number"], "C-102")
+        with override_settings(TICKET_NUMBER_RESET="session", TICKET_NUMBER_SESSION="2026-autumn"):
+            response = create_ticket(phone="87010000003")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["number"], "C-103")
+
+
+class DeskCounterTests(TransactionTestCase):
+    def test_concurrent_first_row_is_not_counted_twice(self):
+        from unittest import mock
+        from django.db.models import QuerySet
+        from .desks import ticket_changed
+        from .models import DeskQueue
+
+        ticket = Ticket.objects.create(number="C-101", service="consultation", desk=42, status="PENDING")
+        # параллельный запрос создал строку по своему подсчёту (наш талон в нём уже есть)
+        # между нашим UPDATE, не нашедшим строку, и нашим INSERT
+        DeskQueue.objects.create(desk=42, pending=1, accepted=0, version=1)
+        update = QuerySet.update
+        calls = []
+
+        def first_update_misses(qs, **kwargs):
+            calls.append(kwargs)
+            return 0 if len(calls) == 1 else update(qs, **kwargs)
+
+        with mock.patch.object(QuerySet, "update", first_update_misses):
+            ticket_changed(ticket)
+        row = DeskQueue.objects.get(desk=42)
+        self.assertEqual((row.pending, row.accepted, row.version), (1, 0, 2))
+
+    def test_api_delete_updates_counters(self):
+        from .models import DeskQueue
+
+        throttling.memory_buckets._buckets.clear()
+        # первый вызван (ACCEPTED, на табло), второй ждёт
+        tickets = [create_ticket(phone=f"8701000000{i}").json() for i in range(2)]
+        client = APIClient()
+        client.post("/api/tickets/next/", {"desk": tickets[0]["desk"]}, format="json")
+        for ticket in tickets:
+            self.assertEqual(client.delete(f"/api/tickets/{ticket['id']}/").status_code, 204)
+
+        row = DeskQueue.objects.get(desk=tickets[0]["desk"])
+        self.assertEqual((row.pending, row.accepted, row.current), (0, 0, None))
+
+
+class TicketFilterScopeTests(TransactionTestCase):
+    def setUp(self):
+        throttling.memory_buckets._buckets.clear()
+        self.ticket = create_ticket().json()
+
+    def test_filters_do_not_apply_to_single_ticket_actions(self):
+        client = APIClient()
+        client.post("/api/tickets/next/", {"desk": self.ticket["desk"]}, format="json")
+        response = client.post(f"/api/tickets/{self.ticket['id']}/done/?status=PENDING", format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["status"], "DONE")
+
+    def test_list_is_filtered(self):
+        client = APIClient()
+        self.assertEqual(len(client.get("/api/tickets/?status=PENDING").json()["results"]), 1)
+        self.assertEqual(client.get("/api/tickets/?status=DONE").json()["results"], [])
+
+    def test_pending_rejects_other_status(self):
+        self.assertEqual(self.client.get("/api/tickets/pending/?status=DONE").status_code, 400)
+        self.assertEqual(len(self.client.get("/api/tickets/pending/?status=PENDING").json()["results"]), 1)
+
+
+class BulkOperationTests(TransactionTestCase):
+    def setUp(self):
+        throttling.memory_buckets._buckets.clear()
+        self.ticket = create_ticket().json()
+
+    def test_reassign_to_unknown_desk_is_rejected(self):
+        from .desks import reassign_pending
+        with self.assertRaises(ValueError):
+            reassign_pending(self.ticket["desk"], 999)
+        self.assertEqual(Ticket.objects.get(id=self.ticket["id"]).desk, self.ticket["desk"])
+
+    def test_bulk_operations_reset_board_screens(self):
+        from .desks import cancel_pending
+        cancel_pending(self.ticket["desk"])
+        self.assertEqual(list(BoardEvent.objects.values_list("status", flat=True)), ["RESET"])
+
+    def test_close_day_only_touches_selected_desks(self):
+        from django.utils import timezone
+        from .desks import close_day
+        other = create_ticket(phone="87010000002", category="foreign").json()
+        self.assertNotEqual(other["desk"], self.ticket["desk"])
+        self.assertEqual(close_day(timezone.localdate(), desks=[self.ticket["desk"]]), (1, 0))
+        self.assertEqual(Ticket.objects.get(id=other["id"]).status, "PENDING")
+
+    def admin_action(self, action, **data):
+        from django.contrib.auth.models import User
+        from .models import DeskQueue
+
+        admin = User.objects.filter(username="admin").first() or User.objects.create_superuser("admin", password="p")
+        self.client.force_login(admin)
+        row = DeskQueue.objects.get(desk=self.ticket["desk"])
+        response = self.client.post("/admin/tickets/deskqueue/", {"action": action, "_selected_action": [row.pk], **data})
+        log_buffer.flush()
+        return response
+
+    def test_admin_reassign_asks_for_target_desk(self):
+        response = self.admin_action("reassign_pending_action")
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'name="to_desk"')
+        self.assertEqual(Ticket.objects.get(id=self.ticket["id"]).desk, self.ticket["desk"])
+
+        response = self.admin_action("reassign_pending_action", apply="1", to_desk=11)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Ticket.objects.get(id=self.ticket["id"]).desk, 11)
+
+    def test_admin_close_day_logs_once_with_counts(self):
+        from operators.models import OperatorLog
+
+        self.admin_action("close_day_action")
+        (log,) = OperatorLog.objects.filter(action="CLOSE_DAY")
+        self.assertEqual((log.desk, log.meta["desks"], log.meta["cancelled"], log.meta["done"]),
+                         (0, [self.ticket["desk"]], 1, 0))
+
+
+class BoardTests(TransactionTestCase):
+    def test_etag_follows_desk_versions(self):
+        from config.models import Revision
+
+        throttling.memory_buckets._buckets.clear()
+        ticket = create_ticket().json()
+        etag = self.client.get("/api/tickets/board/")["ETag"]
+        self.assertEqual(self.client.get("/api/tickets/board/", HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        APIClient().post("/api/tickets/next/", {"desk": ticket["desk"]}, format="json")
+        response = self.client.get("/api/tickets/board/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()[str(ticket["desk"])]["id"], ticket["id"])
+        # вызов талона не пишет в общую строку Revision
+        self.assertFalse(Revision.objects.filter(key="board").exists())
+
+
+class AdminEditTests(TransactionTestCase):
+    def test_editing_called_ticket_refreshes_board(self):
+        from django.contrib.auth.models import User
+        from .models import DeskQueue
+
+        throttling.memory_buckets._buckets.clear()
+        ticket = create_ticket().json()
+        APIClient().post("/api/tickets/next/", {"desk": ticket["desk"]}, format="json")
+        etag = self.client.get("/api/tickets/board/")["ETag"]
+
+        admin = User.objects.create_superuser("admin", password="p")
+        self.client.force_login(admin)
+        t = Ticket.objects.get(id=ticket["id"])
+        form = {f: getattr(t, f) or "" for f in ("number", "service", "category", "phone", "status", "desk")}
+        form.update(fio="Новое ФИО", service_day=t.service_day.isoformat(), is_online="")
+        response = self.client.post(f"/admin/tickets/ticket/{t.id}/change/", form)
+        self.assertEqual(response.status_code, 302, getattr(response, "context", None) and response.context["adminform"].form.errors)
+
+        self.assertEqual(DeskQueue.objects.get(desk=ticket["desk"]).current["fio"], "Новое ФИО")
+        self.assertNotEqual(self.client.get("/api/tickets/board/")["ETag"], etag)
+
+    def test_api_patch_of_called_ticket_refreshes_board(self):
+        throttling.memory_buckets._buckets.clear()
+        ticket = create_ticket().json()
+        client = APIClient()
+        client.post("/api/tickets/next/", {"desk": ticket["desk"]}, format="json")
+        etag = self.client.get("/api/tickets/board/")["ETag"]
+
+        response = client.patch(f"/api/tickets/{ticket['id']}/", {"fio": "Новое ФИО"}, format="json")
+        self.assertEqual(response.status_code, 200)
+        board = self.client.get("/api/tickets/board/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(board.status_code, 200)
+        self.assertEqual(board.json()[str(ticket["desk"])]["fio"], "Новое ФИО")
+
+
+def run_concurrently(*calls):
+    """Запускает calls в отдельных потоках (у каждого своё соединение с БД) одновременно."""
+    import threading
+    from django.db import connection
+
+    barrier = threading.Barrier(len(calls))
+    results = [None] * len(calls)
+
+    def worker(i, call):
+        try:
+            barrier.wait()
+            results[i] = call()
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=worker, args=(i, call)) for i, call in enumerate(calls)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+class ConcurrencyTests(TransactionTestCase):
+    """Выдача номера, вызов талона и Idempotency-Key под параллельными запросами."""
+
+    def setUp(self):
+        throttling.memory_buckets._buckets.clear()
+
+    def tearDown(self):
+        # журнал операторов — до очистки БД между тестами
+        log_buffer.flush()
+
+    def test_concurrent_creates_get_distinct_numbers(self):
+        responses = run_concurrently(*[
+            lambda i=i: create_ticket(phone=f"870100000{i:02d}") for i in range(6)
+        ])
+        self.assertEqual([r.status_code for r in responses], [201] * 6)
+        numbers = sorted(r.json()["number"] for r in responses)
+        self.assertEqual(numbers, [f"C-{n}" for n in range(101, 107)])
+
+        from .models import DeskQueue
+        self.assertEqual(DeskQueue.objects.get(desk=responses[0].json()["desk"]).pending, 6)
+
+    def test_concurrent_call_next_claims_distinct_tickets(self):
+        from django.contrib.auth.models import User
+        from django.test import Client
+        from operators.models import OperatorProfile
+
+        tickets = [create_ticket(phone=f"870100000{i:02d}").json() for i in range(2)]
+        desk = tickets[0]["desk"]
+        clients = []
+        for i in range(2):
+            user = User.objects.create_user(f"operator{i}", password="p")
+            # два оператора на одном desk: первый берёт талон, второй — уже следующий
+            OperatorProfile.objects.create(user=user, desk=desk)
+            client = Client()
+            client.force_login(user)
+            clients.append(client)
+
+        def call_next(client):
+            def call():
+                return client.post("/operator/call-next/", HTTP_X_REQUESTED_WITH="XMLHttpRequest")
+            return call
+
+        responses = run_concurrently(*[call_next(c) for c in clients])
+        codes = sorted(r.status_code for r in responses)
+        claimed = [r.json()["ticket"] for r in responses if r.status_code == 200]
+        # второй либо взял другой талон, либо увидел уже вызванный (409) — но не тот же самый
+        self.assertIn(codes, ([200, 200], [200, 409]))
+        self.assertEqual(len(claimed), len(set(claimed)))
+        self.assertEqual(Ticket.objects.filter(status="ACCEPTED").count(), len(claimed))
+
+    def test_replayed_idempotency_key_returns_same_ticket(self):
+        first = create_ticket(headers={"HTTP_IDEMPOTENCY_KEY": "kiosk-1-0001"})
+        again = create_ticket(headers={"HTTP_IDEMPOTENCY_KEY": "kiosk-1-0001"})
+        self.assertEqual(again.status_code, 201)
+        self.assertEqual(again["Idempotent-Replayed"], "true")
+        self.assertEqual(again.json(), first.json())
+        self.assertEqual(Ticket.objects.count(), 1)
+
+    def test_key_reused_with_other_data_is_rejected(self):
+        create_ticket(headers={"HTTP_IDEMPOTENCY_KEY": "kiosk-1-0003"})
+        other = create_ticket(phone="87010000002", fio="Другой", headers={"HTTP_IDEMPOTENCY_KEY": "kiosk-1-0003"})
+        self.assertEqual(other.status_code, 422)
+        self.assertNotIn("phone", other.json())
+        self.assertEqual(Ticket.objects.count(), 1)
+
+    def test_concurrent_retries_with_one_key_issue_one_ticket(self):
+        responses = run_concurrently(*[
+            lambda: create_ticket(headers={"HTTP_IDEMPOTENCY_KEY": "kiosk-1-0002"}) for _ in range(3)
+        ])
+        self.assertEqual([r.status_code for r in responses], [201] * 3)
+        self.assertEqual(len({r.json()["id"] for r in responses}), 1)
+        self.assertEqual(Ticket.objects.count(), 1)
+
+    def test_work_stealing_and_own_call_claim_distinct_tickets(self):
+        from django.contrib.auth.models import User
+        from django.test import Client
+        from operators.models import OperatorProfile
+        from .desks import rebuild_counters
+
+        # static routing положил всю очередь на desk 11, сосед по группе "foreign" (12) пуст
+        ids = [create_ticket(phone=f"870100000{i:02d}", category="foreign").json()["id"] for i in range(2)]
+        Ticket.objects.filter(id__in=ids).update(desk=11)
+        rebuild_counters()
+
+        clients = []
+        for desk in (11, 12):
+            user = User.objects.create_user(f"operator{desk}", password="p")
+            OperatorProfile.objects.create(user=user, desk=desk)
+            client = Client()
+            client.force_login(user)
+            clients.append(client)
+
+        responses = run_concurrently(*[
+            lambda c=c: c.post("/operator/call-next/", HTTP_X_REQUESTED_WITH="XMLHttpRequest") for c in clients
+        ])
+        self.assertEqual([r.status_code for r in responses], [200, 200])
+        accepted = dict(Ticket.objects.filter(status="ACCEPTED").values_list("desk", "id"))
+        self.assertEqual(set(accepted), {11, 12})
+        self.assertEqual(set(accepted.values()), set(ids))
+
+
+class TokenBucketTests(TransactionTestCase):
+    def take_all(self, buckets):
+        items = [("ip:1", 2.0, 1 / 60), ("phone:7010000001", 1.0, 1 / 600)]
+        first, second = buckets.take(items), buckets.take(items)
+        other_phone = buckets.take([("ip:1", 2.0, 1 / 60), ("phone:7010000002", 1.0, 1 / 600)])
+        return first, second, other_phone
+
+    def test_memory_buckets(self):
+        first, second, other_phone = self.take_all(throttling.MemoryBuckets())
+        self.assertEqual(first, 0)
+        # телефон пуст — отказ, и токен IP при этом не тратится
+        self.assertGreater(second, 0)
+        self.assertEqual(other_phone, 0)
+
+    def test_database_buckets(self):
+        from .models import RateBucket
+        first, second, other_phone = self.take_all(throttling.DatabaseBuckets())
+        self.assertEqual((first, other_phone), (0, 0))
+        self.assertGreater(second, 0)
+        self.assertAlmostEqual(RateBucket.objects.get(key="ip:1").tokens, 0, places=2)
+
+    def test_memory_buckets_are_bounded(self):
+        buckets = throttling.MemoryBuckets(max_keys=3)
+        for i in range(10):
+            buckets.take([(f"ip:{i}", 1.0, 1.0)])
+        self.assertEqual(list(buckets._buckets), ["ip:7", "ip:8", "ip:9"])
+
+
+def old_route_group(data):
+    """Прежний if/else из api.route_desk — эталон для таблицы routing.ROUTE_RULES."""
+    service, category = data.get("service"), data.get("category") or ""
+    track, profile = data.get("track") or "", data.get("profile") or ""
+    if service == "online":
+        return None
+    if service == "consultation" and track == "design":
+        return "design"
+    if service in ("admission", "contest") and profile == "creative":
+        return "design"
+    if service in ("consultation", "admission", "contest") and category in ("foreign", "master", "army"):
+        return category
+    return "default"
+
+
+class RoutingTests(SimpleTestCase):
+    def tearDown(self):
+        from . import routing
+        routing.reload_cfg()
+
+    def test_table_matches_old_lookup(self):
+        import itertools
+        from . import routing
+
+        cfg = routing.reload_cfg()
+        values = {
+            "service": ["online", "consultation", "admission", "contest", "unknown", None],
+            "category": ["foreign", "master", "army", "after11", "", None],
+            "track": ["design", "other", None],
+            "profile": ["creative", "math_inf", None],
+        }
+        for combo in itertools.product(*values.values()):
+            data = dict(zip(values, combo))
+            group = old_route_group(data)
+            expected = tuple(cfg["desks"][group]) if group else ()
+            self.assertEqual(routing.desks_for(data), expected, data)
+
+    def test_config_reloaded_when_file_changes(self):
+        import os
+        import tempfile
+        from pathlib import Path
+        from . import routing
+
+        with tempfile.TemporaryDirectory() as base:
+            path = Path(base) / "static" / "config" / "config.json"
+            path.parent.mkdir(parents=True)
+            path.write_text(json.dumps({"desks": {"army": [5]}}), encoding="utf-8")
+            with override_settings(BASE_DIR=base, ROUTING_CONFIG_RECHECK=0):
+                routing.reload_cfg()
+                self.assertEqual(routing.desks_for({"service": "consultation", "category": "army"}), (5,))
+
+                path.write_text(json.dumps({"desks": {"army": [7, 8]}}), encoding="utf-8")
+                # mtime мог не успеть смениться на грубых файловых системах
+                os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 10**9))
+                self.assertEqual(routing.desks_for({"service": "consultation", "category": "army"}), (7, 8))
+
+
+class ProjectionTests(TransactionTestCase):
+    def setUp(self):
+        throttling.memory_buckets._buckets.clear()
+        for i in range(2):
+            create_ticket(phone=f"8701000000{i}")
+        APIClient().post("/api/tickets/next/", {"desk": Ticket.objects.first().desk}, format="json")
+
+    def test_rows_match_serializer(self):
+        from .api import TicketSerializer
+        from .projection import project, ticket_row, ticket_rows
+
+        qs = Ticket.objects.order_by("id")
+        expected = [dict(row) for row in TicketSerializer(qs, many=True).data]
+        rows = ticket_rows(project(qs))
+        self.assertEqual(rows, expected)
+        self.assertEqual([list(row) for row in rows], [list(row) for row in expected])
+        self.assertEqual(ticket_row(qs.first()), expected[0])
+
+    def test_labels(self):
+        from .projection import project, ticket_rows
+
+        (row,) = ticket_rows(project(Ticket.objects.filter(status="ACCEPTED")), lang="ru")
+        self.assertEqual(
+            (row["service_label"], row["category_label"], row["status_label"]),
+            ("Консультация", "Военный", "Вызван"),
+        )
+
+
+class RolloverTests(TransactionTestCase):
+    def setUp(self):
+        from datetime import timedelta
+        from django.utils import timezone
+
+        throttling.memory_buckets._buckets.clear()
+        self.ids = [create_ticket(phone=f"8701000000{i}").json()["id"] for i in range(6)]
+        self.yesterday = timezone.localdate() - timedelta(days=1)
+        # четыре закрытых вчерашних, один вчерашний ещё в очереди, один сегодняшний
+        Ticket.objects.filter(id__in=self.ids[:5]).update(service_day=self.yesterday, status="DONE")
+        Ticket.objects.filter(id=self.ids[4]).update(status="PENDING")
+
+    def test_moves_only_closed_tickets_of_past_days(self):
+        from io import StringIO
+        from django.core.management import call_command
+        from .models import TicketArchive, TicketSequence
+
+        TicketSequence.objects.create(prefix="C", period=self.yesterday.isoformat(), value=150)
+        call_command("rollover_tickets", chunk_size=3, stdout=StringIO())
+
+        self.assertEqual(sorted(TicketArchive.objects.values_list("id", flat=True)), self.ids[:4])
+        self.assertEqual(sorted(Ticket.objects.values_list("id", flat=True)), self.ids[4:])
+        self.assertFalse(TicketSequence.objects.filter(period=self.yesterday.isoformat()).exists())
+
+    def test_archive_endpoint_pages_and_filters(self):
+        from django.utils import timezone
+        from .archive import rollover
+
+        rollover(timezone.localdate())
+        client = APIClient()
+        page = client.get(f"/api/tickets/archive/?page_size=3&date_to={self.yesterday}").json()
+        self.assertEqual([row["id"] for row in page["results"]], self.ids[3::-1][:3])
+        page = client.get(page["next"]).json()
+        self.assertEqual([row["id"] for row in page["results"]], self.ids[:1])
+        self.assertIsNone(page["next"])
+        self.assertEqual(page["results"][0]["status"], "DONE")
+        self.assertEqual(client.get("/api/tickets/archive/?status=CANCELLED").json()["results"], [])
+
+
+@override_settings(SERVICE_TIME_ESTIMATOR={"alpha": 0.5, "default": 300, "max": 3600})
+class ServiceTimeTests(TransactionTestCase):
+    def setUp(self):
+        throttling.memory_buckets._buckets.clear()
+
+    def test_ewma(self):
+        from .desks import record_service_time
+        from .models import ServiceTimeEstimate
+
+        record_service_time(5, "consultation", 100)
+        record_service_time(5, "consultation", 200)
+        # забытый талон ограничен "max"
+        record_service_time(5, "consultation", 10 ** 6)
+        estimate = ServiceTimeEstimate.objects.get(desk=5, service="consultation")
+        self.assertAlmostEqual(estimate.avg_seconds, ((100 + 200) / 2 + 3600) / 2)
+        self.assertEqual(estimate.samples, 3)
+
+    def test_done_records_service_time_and_wait_uses_it(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from .models import ServiceTimeEstimate
+
+        first = create_ticket(phone="87010000001").json()
+        # очереди ещё нет оценки — берётся "default"
+        self.assertEqual(create_ticket(phone="87010000002").json()["estimated_wait"], 300)
+        client = APIClient()
+        client.post("/api/tickets/next/", {"desk": first["desk"]}, format="json")
+        Ticket.objects.filter(id=first["id"]).update(accepted_at=timezone.now() - timedelta(seconds=120))
+        done = client.post(f"/api/tickets/{first['id']}/done/", format="json").json()
+        self.assertIsNotNone(done["done_at"])
+        self.assertAlmostEqual(ServiceTimeEstimate.objects.get(desk=first["desk"]).avg_seconds, 120, delta=1)
+
+        # перед новым талоном: второй (PENDING), вызванных нет
+        self.assertAlmostEqual(create_ticket(phone="87010000003").json()["estimated_wait"], 120, delta=1)
+
+
+class AsyncReadViewTests(TransactionTestCase):
+    def setUp(self):
+        throttling.memory_buckets._buckets.clear()
+        self.tickets = [create_ticket(phone=f"8701000000{i}").json() for i in range(3)]
+
+    def get(self, path, headers=None):
+        async def scenario():
+            return await AsyncClient().get(path, headers=headers)
+        return asyncio.run(scenario())
+
+    def test_pending_pages_oldest_first(self):
+        desk = self.tickets[0]["desk"]
+        page = self.get(f"/api/tickets/pending/?desk={desk}&page_size=2").json()
+        self.assertEqual([t["id"] for t in page["results"]], [t["id"] for t in self.tickets[:2]])
+
+        rest = self.get(page["next"].removeprefix("http://testserver")).json()
+        self.assertEqual([t["id"] for t in rest["results"]], [self.tickets[2]["id"]])
+        self.assertIsNone(rest["next"])
+
+        self.assertEqual(self.get("/api/tickets/pending/?cursor=garbage").status_code, 404)
+        self.assertEqual(self.get("/api/tickets/pending/?desk=999").json()["results"], [])
+
+    def test_board_not_modified_until_desk_changes(self):
+        response = self.get("/api/tickets/board/")
+        self.assertEqual(response.json(), {})
+        etag = response["ETag"]
+        self.assertEqual(self.get("/api/tickets/board/", headers={"If-None-Match": etag}).status_code, 304)
+
+        APIClient().post("/api/tickets/next/", {"desk": self.tickets[0]["desk"]}, format="json")
+        response = self.get("/api/tickets/board/", headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()[str(self.tickets[0]["desk"])]["id"], self.tickets[0]["id"])
+
+    def test_read_only(self):
+        async def scenario():
+            return await AsyncClient().post("/api/tickets/board/")
+        self.assertEqual(asyncio.run(scenario()).status_code, 405)
@@ -0,0 +1,159 @@
+"""
+Ограничение частоты выдачи талонов (POST /api/tickets/): token bucket по IP клиента
+и по номеру телефона. Проверка идёт в DRF до сериализатора и perform_create,
+так что отказ (429) не пишет в Ticket, TicketSequence и DeskQueue.
+
+Лимиты — config.json["limits"]["ticketCreate"] (перечитывается по mtime, см. routing.get_cfg):
+    {"ip": {"burst": 30, "perMinute": 20}, "phone": {"burst": 3, "perMinute": 0.1}}
+burst — сколько талонов можно взять подряд, perMinute — скорость пополнения; burst 0 — без лимита.
+
+FeatureFlag:
+    "throttle.ticket_create" (вкл. по умолчанию) — ограничитель вообще;
+    "throttle.shared" (выкл.) — корзины в БД (RateBucket), общие для всех воркеров,
+    вместо памяти процесса.
+"""
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework.throttling import BaseThrottle
+
+from config.utils import is_enabled
+
+from . import idempotency
+from .models import RateBucket
+from .routing import get_cfg
+
+
+THROTTLE_FLAG = "throttle.ticket_create"
+SHARED_FLAG = "throttle.shared"
+
+DEFAULT_LIMITS = {
+    # киоск — один IP на весь поток заявителей зала
+    "ip": {"burst": 30, "perMinute": 20},
+    "phone": {"burst": 3, "perMinute": 0.1},
+}
+
+
+def create_limits():
+    """{"ip": (burst, токенов в секунду), "phone": ...} из config.json поверх DEFAULT_LIMITS."""
+    cfg = (get_cfg().get("limits") or {}).get("ticketCreate") or {}
+    limits = {}
+    for name, default in DEFAULT_LIMITS.items():
+        opts = {**default, **(cfg.get(name) or {})}
+        if opts["burst"] and opts["perMinute"]:
+            limits[name] = (float(opts["burst"]), float(opts["perMinute"]) / 60)
+    return limits
+
+
+def _refill(tokens, elapsed, burst, rate):
+    return min(burst, tokens + elapsed * rate)
+
+
+class MemoryBuckets:
+    """Корзины в памяти процесса; не больше max_keys ключей (давно не тронутые вытесняются)."""
+
+    def __init__(self, max_keys=10000):
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._buckets = OrderedDict()
+
+    def take(self, items):
+        """
+        items: [(key, burst, rate)]. Берёт по токену из каждой корзины, только если есть во всех.
+        Возвращает 0 или сколько секунд ждать до следующего токена.
+        """
+        now = time.monotonic()
+        with self._lock:
+            state = []
+            for key, burst, rate in items:
+                tokens, updated = self._buckets.pop(key, (burst, now))
+                state.append((key, _refill(tokens, now - updated, burst, rate), rate))
+            wait = max([(1 - tokens) / rate for _, tokens, rate in state if tokens < 1], default=0)
+            for key, tokens, _ in state:
+                self._buckets[key] = (tokens if wait else tokens - 1, now)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return wait
+
+
+class DatabaseBuckets:
+    """Те же корзины в RateBucket: одна короткая транзакция, при отказе — без записи."""
+
+    def take(self, items):
+        now = timezone.now()
+        with transaction.atomic():
+            rows = {
+                b.key: b
+                for b in RateBucket.objects.select_for_update().filter(key__in=[key for key, _, _ in items])
+            }
+            state = []
+            for key, burst, rate in items:
+                b = rows.get(key)
+                tokens = burst if b is None else _refill(b.tokens, (now - b.updated_at).total_seconds(), burst, rate)
+                state.append((key, tokens, rate, b))
+            wait = max([(1 - tokens) / rate for _, tokens, rate, _ in state if tokens < 1], default=0)
+            if wait:
+                return wait
+
+            for key, tokens, _, b in state:
+                if b is not None:
+                    RateBucket.objects.filter(pk=b.pk).update(tokens=tokens - 1, updated_at=now)
+                    continue
+                try:
+                    with transaction.atomic():
+                        RateBucket.objects.create(key=key, tokens=tokens - 1, updated_at=now)
+                except IntegrityError:
+                    # корзину только что создал параллельный запрос
+                    RateBucket.objects.filter(key=key).update(tokens=tokens - 1, updated_at=now)
+        return 0
+
+
+memory_buckets = MemoryBuckets()
+database_buckets = DatabaseBuckets()
+
+
+def normalize_phone(phone):
+    return re.sub(r"\D", "", str(phone or ""))[-10:]
+
+
+# RateBucket.key — max_length=80; значение после префикса не длиннее этого
+KEY_VALUE_LENGTH = 64
+
+
+class TicketCreateThrottle(BaseThrottle):
+    """DRF throttle для TicketViewSet.create (см. TicketViewSet.get_throttles)."""
+
+    def __init__(self):
+        self._wait = 0
+
+    def allow_request(self, request, view):
+        if not is_enabled(THROTTLE_FLAG, True):
+            return True
+        # повтор уже выданного талона (тот же Idempotency-Key) токен не тратит
+        key = request.headers.get(idempotency.HEADER, "").strip()
+        if key and len(key) <= idempotency.MAX_LENGTH and idempotency.lookup(key) is not None:
+            return True
+        limits = create_limits()
+
+        items = []
+        if "ip" in limits:
+            # get_ident() доверяет X-Forwarded-For только при REST_FRAMEWORK["NUM_PROXIES"]
+            # (settings.py), иначе это REMOTE_ADDR — подменой заголовка лимит не обойти
+            items.append(("ip:" + self.get_ident(request)[:KEY_VALUE_LENGTH], *limits["ip"]))
+        data = request.data
+        phone = normalize_phone(data.get("phone")) if hasattr(data, "get") else ""
+        if phone and "phone" in limits:
+            items.append(("phone:" + phone, *limits["phone"]))
+        if not items:
+            return True
+
+        buckets = database_buckets if is_enabled(SHARED_FLAG, False) else memory_buckets
+        self._wait = buckets.take(items)
+        return not self._wait
+
+    def wait(self):
+        return self._wait
@@ -1,7 +1,13 @@
+from django.urls import path
 from rest_framework.routers import DefaultRouter
+from . import views
 from .api import TicketViewSet
 
 router = DefaultRouter()
 router.register(r"tickets", TicketViewSet)
 
-urlpatterns = router.urls
+# async-представления чтения — раньше роутера, чтобы не попасть в tickets/{pk}/
+urlpatterns = [
+    path("tickets/pending/", views.pending, name="ticket-pending"),
+    path("tickets/board/", views.board, name="ticket-board"),
+] + router.urls
@@ -1,3 +1,67 @@
-from django.shortcuts import render
+import hmac
 
-# Create your views here.
+from django.conf import settings
+from django.http import Http404, HttpResponse, HttpResponseNotModified, JsonResponse
+from django.utils.http import parse_etags
+from django.views.decorators.http import require_GET
+from rest_framework.exceptions import NotFound
+
+from .api import PendingPagination, TicketFilter
+from .desks import aboard_snapshot, aboard_version
+from .metrics import render_metrics
+from .models import Ticket
+from .projection import project, ticket_rows
+
+
+# -------------------------
+# Async read endpoints (ASGI: опросы табло и очереди не держат поток)
+# Подключены в tickets/urls.py перед роутером DRF, по тем же URL и именам.
+# -------------------------
+@require_GET
+async def pending(request):
+    """GET /api/tickets/pending/?desk=3 -> список PENDING (постранично, от старых к новым)"""
+    if request.GET.get("status", "PENDING") != "PENDING":
+        return JsonResponse({"detail": "pending/ lists only PENDING tickets, use /api/tickets/?status=..."}, status=400)
+    qs = TicketFilter().filter_queryset(request, Ticket.objects.filter(status="PENDING"), None)
+    paginator = PendingPagination()
+    try:
+        page = await paginator.apaginate_queryset(project(qs), request)
+    except NotFound as exc:
+        return JsonResponse({"detail": str(exc.detail)}, status=404)
+    return JsonResponse(paginator.get_paginated_data(ticket_rows(page)))
+
+
+@require_GET
+async def board(request):
+    """
+    GET /api/tickets/board/
+    Текущий ACCEPTED по каждому desk из DeskQueue.current; ETag = версии DeskQueue, без изменений -> 304.
+    """
+    etag = f'"board-{await aboard_version()}"'
+    if etag in parse_etags(request.headers.get("If-None-Match", "")):
+        response = HttpResponseNotModified()
+    else:
+        response = JsonResponse(await aboard_snapshot())
+    response.headers["ETag"] = etag
+    return response
+
+
+def _metrics_allowed(request):
+    token = getattr(settings, "METRICS_TOKEN", "")
+    if token:
+        # Prometheus: authorization: {credentials: ...} -> "Authorization: Bearer <token>"
+        given = request.headers.get("Authorization", "").removeprefix("Bearer ").strip()
+        return hmac.compare_digest(given.encode(), token.encode())
+    # без токена — только прямые запросы с METRICS_ALLOWED_IPS: за обратным прокси на том же
+    # хосте REMOTE_ADDR всегда 127.0.0.1, поэтому запрос с X-Forwarded-For не пускаем
+    if "X-Forwarded-For" in request.headers:
+        return False
+    return request.META.get("REMOTE_ADDR") in getattr(settings, "METRICS_ALLOWED_IPS", ("127.0.0.1", "::1"))
+
+
+@require_GET
+def metrics(request):
+    """GET /metrics/ — Prometheus text format; по METRICS_TOKEN или только локально (см. settings)."""
+    if not _metrics_allowed(request):
+        raise Http404
+    return HttpResponse(render_metrics(), content_type="text/plain; version=0.0.4; charset=utf-8")